@@ -1,165 +1,3416 @@
 import streamlit as st
-from PIL import Image
+import bisect
+import csv
+import functools
+import gzip
+import hashlib
+import hmac
+import importlib.util
+import inspect
+import io
+import ipaddress
 import json
 import os
-import webbrowser
-from datetime import datetime
+import queue
+import re
+import socket
+import socketserver
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import unicodedata
+import urllib.parse
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+# Awal eksekusi skrip; Streamlit menjalankan ulang file ini setiap rerun
+RERUN_STARTED = time.perf_counter()
+
+# PIL dan openpyxl (opsional) baru diimpor saat gambar/XLSX benar-benar dibuat
+HAS_OPENPYXL = importlib.util.find_spec("openpyxl") is not None
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 # ====================== KONFIGURASI ======================
+# Naikkan jika setup_files berubah agar inisialisasi dijalankan ulang
+SETUP_VERSION = 2
+SETUP_STAMP = "data/.setup_version"
+
 PRODUCTS_FILE = "data/products.json"
+CATALOG_VERSION_FILE = "data/catalog_version.json"
 TRANSACTIONS_FILE = "data/transactions.json"
+TRANSACTIONS_JOURNAL = "data/transactions.jsonl"
+TRANSACTIONS_SNAPSHOT = "data/transactions.snapshot.json"  # format lama, dimigrasi ke arsip partisi
+TRANSACTIONS_DIR = "data/transactions/"
+TRANSACTIONS_MANIFEST = "data/transactions/manifest.json"
 USERS_FILE = "data/users.json"
+SQLITE_DB = "data/bakulbawang.db"
+AGGREGATES_FILE = "data/sales_aggregates.json"
+CART_DIR = "data/carts/"
+TRANSACTION_ID_STATE = "data/transaction_id.state"
 LOGO_PATH = "assets/logo.png"
 PRODUCT_IMAGE_DIR = "assets/products/"
+THUMBNAIL_DIR = "assets/thumbnails/"
+BLOB_DIR = "assets/blobs/"
+BLOB_REFS_FILE = "data/blob_refs.json"
+
+# Ukuran potongan saat menyalin upload gambar ke blob store
+BLOB_CHUNK_SIZE = 1024 * 1024
+
+# Thumbnail produk: 2x lebar tampilan kartu (150px) untuk layar high-DPI
+THUMBNAIL_SIZE = (300, 300)
+THUMBNAIL_QUALITY = 80
+
+# Jumlah kartu produk per halaman katalog dan pesanan per halaman riwayat
+PRODUCTS_PAGE_SIZE = 10
+HISTORY_PAGE_SIZE = 10
+
+# Jumlah transaksi yang dibaca per potongan saat ekspor
+EXPORT_CHUNK_SIZE = 1000
+
+# Backend penyimpanan: "json" (default), "sqlite", atau "service" (mode multi-proses)
+STORAGE_BACKEND = os.environ.get("BAKUL_STORAGE_BACKEND", "json")
+
+# Mode multi-proses: produk, transaksi dan user dimiliki satu layanan data
+# (python data_service.py) yang dihubungi semua worker Streamlit. Alamat
+# "unix:/path/socket" atau "host:port" di localhost, jumlah koneksi maksimum
+# per proses worker, dan batas waktu menunggu jawaban (detik)
+DATA_SERVICE_ADDRESS = os.environ.get("BAKUL_DATA_SERVICE", "unix:data/bakul.sock")
+DATA_SERVICE_POOL_SIZE = 8
+DATA_SERVICE_TIMEOUT = 60.0
+
+# Biaya hash password (iterasi PBKDF2-SHA256); password lama di-hash ulang saat login
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("BAKUL_PASSWORD_ITERATIONS", "200000"))
+
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "admin123"
+WHATSAPP_NUMBER = "6281234567890"
+
+# Tarif pengiriman dan pembayaran (rupiah, integer); "name" disimpan di transaksi
+SHIPPING_METHODS = {
+    "jne": {"name": "JNE", "label": "JNE Reguler", "cost": 15000, "estimate": "2-3 hari"},
+    "jnt": {"name": "J&T", "label": "J&T Express", "cost": 12000, "estimate": "1-2 hari"},
+    "sicepat": {"name": "SiCepat", "label": "SiCepat", "cost": 10000, "estimate": "3-5 hari"}
+}
+PAYMENT_METHODS = {
+    "bri": {"label": "Transfer BRI", "fee": 0},
+    "bca": {"label": "Transfer BCA", "fee": 0},
+    "seabank": {"label": "Transfer SeaBank", "fee": 0},
+    "cod": {"label": "COD (Bayar di Tempat)", "fee": 0}
+}
+
+# Antrian job latar belakang: folder job, file dead-letter, jumlah worker per proses,
+# percobaan maksimum, jeda retry awal (detik, berlipat dua tiap gagal), interval polling,
+# dan umur job "processing" (detik) yang dianggap ditinggal proses yang mati
+JOBS_DIR = "data/jobs/"
+JOBS_DEAD_LETTER = "data/jobs_dead.jsonl"
+JOB_WORKERS = 2
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 2.0
+JOB_POLL_INTERVAL = 1.0
+JOB_STALE_SECONDS = 600
+
+# Pesan WhatsApp yang disiapkan untuk admin (dikirim oleh layanan/operator terpisah)
+WHATSAPP_OUTBOX = "data/whatsapp_outbox.jsonl"
+
+# Batas stok default; stok di bawah batas (atau low_stock_threshold milik produk)
+# ditandai hampir habis, muncul di tab Stok Menipis dan memicu peringatan ke admin
+LOW_STOCK_THRESHOLD = 10
+
+# Jurnal transaksi: fsync setiap N record atau setelah jeda (detik),
+# dipadatkan ke arsip partisi bulanan setiap N record
+JOURNAL_FSYNC_BATCH = 16
+JOURNAL_FSYNC_INTERVAL = 1.0
+JOURNAL_COMPACT_EVERY = 5000
+
+# Arsip transaksi per bulan: jumlah bulan terakhir yang disimpan tanpa kompresi
+# dan jumlah partisi yang disimpan di memori per proses
+TRANSACTION_HOT_MONTHS = 2
+TRANSACTION_PARTITION_CACHE = 6
+
+# Profiling per rerun, nonaktif kecuali BAKUL_PROFILING=1 (menulis satu baris log per
+# rerun, jadi hanya untuk diagnosis): jumlah rerun yang disimpan
+# di memori untuk tab Performa, dan log JSON-lines yang dirotasi setelah melewati
+# ukuran maksimum (profile.jsonl -> .1 -> .2 ...)
+PROFILE_ENABLED = os.environ.get("BAKUL_PROFILING", "0") == "1"
+PROFILE_HISTORY = 200
+PROFILE_LOG = "data/profile.jsonl"
+PROFILE_LOG_MAX_BYTES = 2 * 1024 * 1024
+PROFILE_LOG_BACKUPS = 3
+
+# ====================== FUNGSI UTILITAS ======================
+def setup_files():
+    """Inisialisasi file dan folder, ditandai dengan stamp SETUP_VERSION"""
+    os.makedirs("data", exist_ok=True)
+    os.makedirs(CART_DIR, exist_ok=True)
+    os.makedirs("assets", exist_ok=True)
+    os.makedirs(PRODUCT_IMAGE_DIR, exist_ok=True)
+    
+    # Logo default dibuat langsung karena dipakai sebagai gambar cadangan di mana-mana
+    if not os.path.exists(LOGO_PATH):
+        create_placeholder_image(LOGO_PATH, (200, 100), '#FFA500')
+    
+    # Di mode multi-proses data dibuat oleh layanan data, bukan oleh worker. Stamp hanya
+    # ditulis jika data ikut diinisialisasi, agar folder data yang sama tetap dimigrasi
+    # saat nanti dijalankan langsung (tanpa layanan)
+    if STORAGE_BACKEND != "service":
+        setup_data_files()
+        atomic_write_json(SETUP_STAMP, {"version": SETUP_VERSION, "initialized": datetime.now().isoformat()})
+
+def setup_data_files():
+    """Produk contoh, arsip transaksi dan file user"""
+    # Inisialisasi produk contoh
+    if not os.path.exists(PRODUCTS_FILE):
+        sample_products = [
+            {
+                "id": 1,
+                "name": "Bawang Merah",
+                "price": 37905,
+                "stock": 100,
+                "description": "Bawang merah segar kualitas premium",
+                "category": "bawang",
+                "image": os.path.join(PRODUCT_IMAGE_DIR, "bawang_merah.jpg")
+            },
+            {
+                "id": 2,
+                "name": "Bibit Bawang Merah",
+                "price": 49999,
+                "stock": 50,
+                "description": "Bibit unggul siap tanam",
+                "category": "bibit",
+                "image": os.path.join(PRODUCT_IMAGE_DIR, "bibit_bawang.jpg")
+            }
+        ]
+        save_to_json(PRODUCTS_FILE, sample_products)
+        
+        # Gambar contoh dibuat di background; selama belum ada, kartu produk memakai logo
+        placeholders = [
+            (product["image"], (400, 300), '#FF6347' if product["category"] == "bawang" else '#32CD32')
+            for product in sample_products
+            if not os.path.exists(product["image"])
+        ]
+        if placeholders:
+            threading.Thread(target=create_placeholder_images, args=(placeholders,), daemon=True).start()
+
+    # Inisialisasi file lainnya
+    migrate_transactions()
+    if not os.path.exists(USERS_FILE):
+        save_to_json(USERS_FILE, [])
+
+def setup_is_current():
+    """True jika stamp inisialisasi ada dan versinya sama dengan SETUP_VERSION"""
+    try:
+        with open(SETUP_STAMP, 'r', encoding='utf-8') as f:
+            return json.load(f).get("version") == SETUP_VERSION
+    except (OSError, ValueError):
+        return False
+
+def create_placeholder_image(path, size, color):
+    """Gambar polos berwarna sebagai pengganti gambar yang belum ada"""
+    from PIL import Image
+    Image.new('RGB', size, color=color).save(path)
+
+def create_placeholder_images(placeholders):
+    """Buat beberapa gambar pengganti [(path, ukuran, warna)] (dijalankan di background)"""
+    for path, size, color in placeholders:
+        create_placeholder_image(path, size, color)
+
+@st.cache_resource(show_spinner=False)
+def get_startup_stats():
+    """Statistik waktu inisialisasi proses dan durasi rerun (dibagikan antar sesi)"""
+    return {
+        "process_started": datetime.now(),
+        "init_ms": None,
+        "reruns": 0,
+        "last_rerun_ms": None,
+        "total_rerun_ms": 0.0
+    }
+
+@st.cache_resource(show_spinner=False)
+def initialize_app():
+    """Inisialisasi sekali per proses; setup_files dilewati jika stamp versi sudah sesuai"""
+    started = time.perf_counter()
+    if not setup_is_current():
+        setup_files()
+    get_job_queue()
+    get_startup_stats()["init_ms"] = (time.perf_counter() - started) * 1000
+    return True
+
+def record_rerun(duration):
+    """Catat durasi satu rerun (detik) beserta profilnya"""
+    stats = get_startup_stats()
+    stats["reruns"] += 1
+    stats["last_rerun_ms"] = duration * 1000
+    stats["total_rerun_ms"] += duration * 1000
+    PROFILER.finish(duration)
+
+# ====================== PROFIL RERUN ======================
+class RerunProfile:
+    """Pengukuran satu rerun: waktu per section, byte dibaca/ditulis dan waktu parse JSON"""
+    __slots__ = ("page", "sections", "stack", "top_ms", "bytes_read", "bytes_written",
+                 "json_parse_ms", "json_parses")
+
+    def __init__(self):
+        self.page = None
+        self.sections = {}  # nama -> [panggilan, total ms, self ms]
+        self.stack = []  # ms yang dipakai section anak, per section yang sedang berjalan
+        self.top_ms = 0.0  # total ms section paling luar
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.json_parse_ms = 0.0
+        self.json_parses = 0
+
+    def to_record(self, duration):
+        total_ms = duration * 1000
+        return {
+            "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+            "pid": os.getpid(),
+            "page": self.page,
+            "total_ms": round(total_ms, 3),
+            "other_ms": round(max(total_ms - self.top_ms, 0.0), 3),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "json_parse_ms": round(self.json_parse_ms, 3),
+            "json_parses": self.json_parses,
+            "sections": {
+                name: {"calls": calls, "ms": round(ms, 3), "self_ms": round(self_ms, 3)}
+                for name, (calls, ms, self_ms) in self.sections.items()
+            }
+        }
+
+class Profiler:
+    """Profil rerun yang sedang berjalan (per thread) dan riwayat rerun terakhir
+
+    Streamlit menjalankan tiap sesi di thread sendiri, sehingga profil aktif
+    disimpan thread-local; I/O dari thread latar belakang tidak ikut tercatat.
+    """
+
+    def __init__(self, enabled=PROFILE_ENABLED, history=PROFILE_HISTORY, log_path=PROFILE_LOG):
+        self.enabled = enabled
+        self.history = deque(maxlen=history)
+        self.log_path = log_path
+        self._local = threading.local()
+
+    def current(self):
+        return getattr(self._local, "profile", None)
+
+    def begin(self):
+        """Mulai profil rerun baru di thread ini"""
+        if self.enabled:
+            self._local.profile = RerunProfile()
+
+    def finish(self, duration):
+        """Tutup profil rerun (durasi dalam detik), simpan ke riwayat dan log"""
+        profile = self.current()
+        if profile is None:
+            return None
+        self._local.profile = None
+        record = profile.to_record(duration)
+        self.history.append(record)
+        try:
+            self._append_log(record)
+        except OSError:
+            pass  # log profil tidak boleh menggagalkan halaman
+        return record
+
+    @contextmanager
+    def section(self, name, page=False):
+        """Ukur blok kode sebagai section name; page=True menandai halaman rerun ini"""
+        profile = self.current()
+        if profile is None:
+            yield
+            return
+        if page and profile.page is None:
+            profile.page = name
+        profile.stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            children = profile.stack.pop()
+            if profile.stack:
+                profile.stack[-1] += elapsed
+            else:
+                profile.top_ms += elapsed
+            entry = profile.sections.get(name)
+            if entry is None:
+                profile.sections[name] = [1, elapsed, elapsed - children]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += elapsed - children
+
+    def count_io(self, read=0, written=0):
+        """Tambahkan byte yang dibaca/ditulis ke profil aktif"""
+        profile = self.current()
+        if profile is not None:
+            profile.bytes_read += read
+            profile.bytes_written += written
+
+    def parse_json(self, text):
+        """json.loads yang mencatat waktu parse ke profil aktif"""
+        profile = self.current()
+        if profile is None:
+            return json.loads(text)
+        started = time.perf_counter()
+        try:
+            return json.loads(text)
+        finally:
+            profile.json_parse_ms += (time.perf_counter() - started) * 1000
+            profile.json_parses += 1
+
+    def _append_log(self, record):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with open(self.log_path, 'ab') as f:
+            f.write(line.encode('utf-8'))
+            size = f.tell()
+        if size > PROFILE_LOG_MAX_BYTES:
+            self._rotate_log()
+
+    def _rotate_log(self):
+        with file_lock(self.log_path):
+            try:
+                if os.path.getsize(self.log_path) <= PROFILE_LOG_MAX_BYTES:
+                    return  # sudah dirotasi proses lain
+            except FileNotFoundError:
+                return
+            for i in range(PROFILE_LOG_BACKUPS - 1, 0, -1):
+                if os.path.exists(f"{self.log_path}.{i}"):
+                    os.replace(f"{self.log_path}.{i}", f"{self.log_path}.{i + 1}")
+            os.replace(self.log_path, f"{self.log_path}.1")
+
+    def log_files(self):
+        """File log yang ada, dari yang terlama"""
+        paths = [f"{self.log_path}.{i}" for i in range(PROFILE_LOG_BACKUPS, 0, -1)] + [self.log_path]
+        return [path for path in paths if os.path.exists(path)]
+
+    def read_log(self):
+        """Isi seluruh log (termasuk hasil rotasi) sebagai bytes JSON-lines"""
+        chunks = []
+        for path in self.log_files():
+            with open(path, 'rb') as f:
+                chunks.append(f.read())
+        return b"".join(chunks)
+
+@st.cache_resource(show_spinner=False)
+def get_profiler():
+    """Profiler bersama untuk semua sesi dalam satu proses"""
+    return Profiler()
+
+# Diambil sekali per eksekusi skrip; objek yang di-cache (storage, DataStore, ...)
+# tetap memakai Profiler yang sama karena get_profiler di-cache per proses
+PROFILER = get_profiler()
+
+def profiled(func):
+    """Decorator: catat waktu func sebagai section profil rerun"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with PROFILER.section(func.__qualname__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def profiled_page(func):
+    """Seperti profiled, sekaligus menandai func sebagai halaman yang dirender rerun ini"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with PROFILER.section(func.__qualname__, page=True):
+            return func(*args, **kwargs)
+    return wrapper
+
+def profile_methods(cls):
+    """Decorator kelas: profiled untuk semua method publik (generator dilewati)"""
+    for name, value in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(value) and not inspect.isgeneratorfunction(value):
+            setattr(cls, name, profiled(value))
+    return cls
+
+# ====================== PENGUNCIAN & PENULISAN ATOMIK ======================
+@contextmanager
+def file_lock(file_path):
+    """Kunci eksklusif lintas proses untuk file_path (lewat file <file_path>.lock)
+
+    Tidak reentrant: jangan mengunci file yang sama dua kali dalam satu thread.
+    """
+    with open(file_path + ".lock", 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def atomic_write_json(file_path, data, **dump_kwargs):
+    """Tulis JSON ke file sementara lalu rename, sehingga file lama tetap utuh jika proses gagal
+
+    Mengembalikan kunci cache file yang ditulis (lihat DataStore._key). Kunci
+    diambil dari file sementara karena inode, mtime dan ukuran tidak berubah
+    saat rename, sedangkan stat setelah rename bisa saja milik penulis lain.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(file_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+            key = DataStore.stat_key(os.fstat(f.fileno()))
+            PROFILER.count_io(written=key[2])
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return key
+
+# ====================== CACHE DATA ======================
+class FrozenDict(dict):
+    """Dict read-only yang dibagikan dari cache data"""
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Data dari cache bersifat read-only, gunakan load_from_json(..., mutable=True)")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+def freeze(data):
+    """Ubah hasil parse JSON menjadi struktur read-only (dict -> FrozenDict, list -> tuple)"""
+    if isinstance(data, dict):
+        return FrozenDict((k, freeze(v)) for k, v in data.items())
+    if isinstance(data, (list, tuple)):
+        return tuple(freeze(v) for v in data)
+    return data
+
+def thaw(data):
+    """Salinan mutable dari data read-only (kebalikan freeze)"""
+    if isinstance(data, dict):
+        return {k: thaw(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [thaw(v) for v in data]
+    return data
+
+class DataStore:
+    """Cache data JSON per proses, dikunci dengan path + inode + mtime + ukuran file"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def stat_key(stat):
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    def _key(cls, file_path):
+        # Penulisan atomik (rename) selalu menghasilkan inode baru
+        return cls.stat_key(os.stat(file_path))
+
+    def get(self, file_path):
+        """Ambil data read-only, parse ulang hanya jika file berubah"""
+        path = os.path.abspath(file_path)
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        PROFILER.count_io(read=key[2])
+        if content.endswith(','):
+            content = content[:-1]
+        data = freeze(PROFILER.parse_json(content) if content else [])
+        
+        with self._lock:
+            self._entries[path] = (key, data)
+        return data
+
+    def put(self, file_path, data, key):
+        """Simpan data yang baru ditulis aplikasi agar tidak perlu di-parse ulang
+
+        key = hasil atomic_write_json untuk penulisan ini, bukan stat file
+        saat ini (proses lain mungkin sudah menimpanya).
+        """
+        path = os.path.abspath(file_path)
+        frozen = freeze(data)
+        with self._lock:
+            self._entries[path] = (key, frozen)
+
+    def invalidate(self, file_path=None):
+        """Hapus entri cache (semua entri jika file_path None)"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+    def stats(self):
+        """Statistik hit/miss cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries)
+            }
+
+@st.cache_resource
+def get_data_store():
+    """DataStore bersama untuk semua sesi dalam satu proses"""
+    return DataStore()
+
+@profiled
+def load_from_json(file_path, mutable=False):
+    """Memuat data dari file JSON dengan error handling
+    
+    Data diambil dari cache proses dan bersifat read-only. Gunakan
+    mutable=True untuk mendapatkan salinan yang boleh diubah lalu disimpan.
+    """
+    try:
+        data = get_data_store().get(file_path)
+    except Exception as e:
+        st.error(f"Gagal memuat file {file_path}: {str(e)}")
+        return []
+    return thaw(data) if mutable else data
+
+@profiled
+def save_to_json(file_path, data):
+    """Menyimpan data ke file JSON secara atomik"""
+    store = get_data_store()
+    try:
+        store.put(file_path, data, atomic_write_json(file_path, data, indent=4))
+    except Exception as e:
+        store.invalidate(file_path)
+        st.error(f"Gagal menyimpan ke {file_path}: {str(e)}")
+
+# ====================== ID TRANSAKSI ======================
+class TransactionIdAllocator:
+    """Id transaksi unik yang naik monoton lintas proses dan tetap urut waktu
+
+    Id = waktu UTC YYYYMMDDHHMMSS + milidetik (3 digit) + urutan dalam
+    milidetik yang sama. Nilai terakhir disimpan di state_path sebagai satu
+    angka lebar tetap yang ditimpa di tempat di bawah file lock, sehingga
+    proses lain dan restart melanjutkan dari situ walaupun jam mundur.
+    Tanggal transaksi dibuat dari waktu id yang sama (moment) dalam zona
+    waktu lokal, jadi bulan partisi bisa diturunkan dari id.
+    """
+
+    SEQUENCE_DIGITS = 4
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock, file_lock(self.state_path):
+            fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                try:
+                    last = int(os.read(fd, 64))
+                except ValueError:
+                    last = 0  # file baru atau rusak: lanjut dari jam
+                value = max(time.time_ns() // 1_000_000 * 10 ** self.SEQUENCE_DIGITS, last + 1)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, f"{value:020d}\n".encode('ascii'))
+            finally:
+                os.close(fd)
+        return self.format(value)
+
+    @classmethod
+    def format(cls, value):
+        ms, sequence = divmod(value, 10 ** cls.SEQUENCE_DIGITS)
+        moment = datetime.fromtimestamp(ms // 1000, timezone.utc)
+        return f"{moment:%Y%m%d%H%M%S}{ms % 1000:03d}{sequence:0{cls.SEQUENCE_DIGITS}d}"
+
+    @classmethod
+    def moment(cls, trans_id):
+        """Waktu lokal saat trans_id dibuat, None jika bukan id dari allocator ini"""
+        if len(trans_id) != 17 + cls.SEQUENCE_DIGITS or not trans_id.isdigit():
+            return None
+        try:
+            moment = datetime.strptime(trans_id[:14], "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return (moment + timedelta(milliseconds=int(trans_id[14:17]))).astimezone()
+
+@st.cache_resource
+def get_transaction_id_allocator():
+    return TransactionIdAllocator(TRANSACTION_ID_STATE)
+
+def new_transaction_id():
+    """Id untuk transaksi baru (dipakai semua penulis transaksi)"""
+    return get_transaction_id_allocator().next_id()
+
+# ====================== LOG TRANSAKSI ======================
+# Nama file partisi: <bulan>-<seq compaction>.jsonl, .jsonl.gz untuk bulan lama
+PARTITION_FILE_RE = re.compile(r"^\d{4}-\d{2}-\d{10}\.jsonl(\.gz)?$")
+
+def transaction_month(trans):
+    """Bulan partisi (YYYY-MM) dari tanggal transaksi dd/mm/YYYY HH:MM"""
+    date = trans["date"]
+    return f"{date[6:10]}-{date[3:5]}"
+
+def month_hint(trans_id):
+    """Bulan partisi yang mungkin untuk id berawalan timestamp (YYYYMM...), None jika bukan"""
+    moment = TransactionIdAllocator.moment(trans_id)
+    if moment is not None:
+        return f"{moment:%Y-%m}"
+    # Id lama (YYYYMMDDHHMMSS) sudah memakai waktu lokal
+    if len(trans_id) >= 6 and trans_id[:6].isdigit():
+        return f"{trans_id[:4]}-{trans_id[4:6]}"
+    return None
+
+def cold_month_cutoff(now=None):
+    """Partisi dengan bulan sebelum nilai ini (YYYY-MM) disimpan terkompresi"""
+    now = now or datetime.now()
+    index = now.year * 12 + now.month - 1 - (TRANSACTION_HOT_MONTHS - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def write_partition(path, transactions):
+    """Tulis partisi JSON-lines secara atomik, dikompresi gzip jika path berakhiran .gz"""
+    payload = "".join(
+        json.dumps(trans, ensure_ascii=False, separators=(',', ':')) + "\n" for trans in transactions
+    ).encode('utf-8')
+    if path.endswith(".gz"):
+        payload = gzip.compress(payload, mtime=0)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        PROFILER.count_io(written=len(payload))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def read_partition(path):
+    """Iterasi transaksi (read-only) dari file partisi, dibaca per baris"""
+    PROFILER.count_io(read=os.path.getsize(path))
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield freeze(PROFILER.parse_json(line))
+
+def partition_entry(file_name, transactions):
+    """Entri manifest untuk satu partisi: file, jumlah transaksi, per user dan per status"""
+    users = {}
+    statuses = {}
+    for trans in transactions:
+        users[trans["username"]] = users.get(trans["username"], 0) + 1
+        status = trans.get("status", "pending")
+        statuses[status] = statuses.get(status, 0) + 1
+    return {"file": file_name, "count": len(transactions), "users": users, "statuses": statuses}
+
+def build_partitions(directory, by_month, seq):
+    """Tulis {bulan: [transaksi]} sebagai file partisi baru, kembalikan entri manifest per bulan"""
+    cutoff = cold_month_cutoff()
+    entries = {}
+    for month, transactions in by_month.items():
+        file_name = f"{month}-{seq:010d}.jsonl" + (".gz" if month < cutoff else "")
+        write_partition(os.path.join(directory, file_name), transactions)
+        entries[month] = partition_entry(file_name, transactions)
+    return entries
+
+class TransactionPartition:
+    """Isi satu partisi bulanan (read-only) dengan index id, user dan status"""
+    __slots__ = ("items", "index", "by_user", "by_status")
+
+    def __init__(self, transactions):
+        self.items = tuple(transactions)
+        self.index = {}  # id -> posisi di items
+        self.by_user = {}  # username -> list posisi (urut waktu)
+        self.by_status = {}  # status -> list posisi (urut waktu)
+        for position, trans in enumerate(self.items):
+            self.index.setdefault(trans["id"], position)
+            self.by_user.setdefault(trans["username"], []).append(position)
+            self.by_status.setdefault(trans.get("status", "pending"), []).append(position)
+
+class TransactionLog:
+    """Jurnal transaksi append-only (JSON lines) di atas arsip partisi bulanan
+
+    Arsip berisi satu file per bulan dan manifest.json berisi seq terakhir
+    yang sudah dipadatkan serta jumlah transaksi per user/status tiap
+    partisi. File partisi tidak pernah diubah: compaction menulis file baru
+    lalu mengganti manifest, sehingga manifest menjadi titik commit dan
+    record jurnal dengan seq <= seq manifest tidak diterapkan dua kali.
+
+    Pembaca hanya membuka partisi yang dibutuhkan (transaksi terbaru,
+    riwayat satu user, status tertentu); partisi yang sudah dibuka disimpan
+    di cache LRU. Perubahan status transaksi arsip dicatat di jurnal dan
+    diterapkan saat dibaca sampai compaction berikutnya.
+    """
+
+    def __init__(self, journal_path, directory, fsync_batch=JOURNAL_FSYNC_BATCH,
+                 fsync_interval=JOURNAL_FSYNC_INTERVAL, compact_every=JOURNAL_COMPACT_EVERY,
+                 cache_size=TRANSACTION_PARTITION_CACHE, schedule_compaction=None):
+        self.journal_path = journal_path
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.cache_size = cache_size
+        # Dipanggil sekali saat jurnal melewati compact_every (mis. menjadwalkan job);
+        # None = compact langsung di penulisan itu
+        self.schedule_compaction = schedule_compaction
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self._partitions = OrderedDict()  # nama file -> TransactionPartition (LRU)
+        self._reset()
+        self._repair_journal()
+
+    def _reset(self):
+        self._manifest_key = None
+        self._manifest = FrozenDict({"seq": 0, "partitions": FrozenDict()})
+        self._months = []  # bulan di manifest, urut naik
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._seq = 0
+        self._items = []  # transaksi di jurnal yang belum dipadatkan
+        self._index = {}  # id -> posisi di _items
+        self._status_index = {}  # status -> set posisi di _items
+        self._user_index = {}  # username -> list posisi di _items (urut waktu)
+        self._overrides = {}  # id transaksi arsip -> (status baru, bulan partisi)
+        self._view = None
+        self._compaction_scheduled = False
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _exclusive(self):
+        """Lock antar thread + file lock antar proses, boleh bersarang dalam satu thread"""
+        with self._lock:
+            if self._lock_depth:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            with file_lock(self.journal_path):
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+
+    def _repair_journal(self):
+        """Buang baris terakhir yang terpotong (crash saat menulis)
+
+        Dijalankan dengan lock jurnal: tanpa lock, baris yang sedang ditulis
+        proses lain terlihat terpotong dan ikut terbuang.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        with self._exclusive():
+            with open(self.journal_path, 'rb+') as f:
+                data = f.read()
+                if data and not data.endswith(b'\n'):
+                    f.truncate(data.rfind(b'\n') + 1)
+
+    def _load_manifest(self):
+        self._reset()
+        self._manifest_key = self._stat_key(self.manifest_path)
+        if self._manifest_key is None:
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        PROFILER.count_io(read=self._manifest_key[2])
+        self._manifest = freeze(PROFILER.parse_json(content))
+        self._seq = self._manifest["seq"]
+        self._months = sorted(self._manifest["partitions"])
+
+    def _add(self, trans):
+        position = len(self._items)
+        self._index.setdefault(trans["id"], position)
+        self._status_index.setdefault(trans.get("status", "pending"), set()).add(position)
+        self._user_index.setdefault(trans["username"], []).append(position)
+        self._items.append(trans)
+
+    def _apply(self, record):
+        if record["seq"] <= self._seq:
+            return  # sudah termasuk di arsip
+        self._seq = record["seq"]
+        self._journal_records += 1
+        
+        if record["op"] == "add":
+            self._add(freeze(record["data"]))
+        elif record["op"] == "status":
+            index = self._index.get(record["id"])
+            if index is not None:
+                trans = dict(self._items[index])
+                self._status_index[trans.get("status", "pending")].discard(index)
+                self._status_index.setdefault(record["status"], set()).add(index)
+                trans["status"] = record["status"]
+                self._items[index] = FrozenDict(trans)
+            else:
+                # Record dari versi lama belum mencatat bulan partisi
+                month = record.get("month") or self._find_month(record["id"])
+                if month is not None:
+                    self._overrides[record["id"]] = (record["status"], month)
+
+    def _refresh(self):
+        """Sinkronkan state di memori dengan file, hanya membaca bagian jurnal yang baru"""
+        changed = False
+        if self._stat_key(self.manifest_path) != self._manifest_key:
+            self._load_manifest()
+            changed = True
+        
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._journal_offset:
+            # Jurnal sudah dipadatkan di tempat lain, muat ulang dari manifest
+            self._load_manifest()
+            changed = True
+        
+        if size > self._journal_offset:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                chunk = f.read(size - self._journal_offset)
+            PROFILER.count_io(read=len(chunk))
+            end = chunk.rfind(b'\n') + 1  # baris yang belum selesai ditulis dibaca nanti
+            for line in chunk[:end].splitlines():
+                if line.strip():
+                    self._apply(PROFILER.parse_json(line))
+            self._journal_offset += end
+            changed = changed or end > 0
+        
+        if changed:
+            self._view = None
+
+    def _partition(self, month):
+        """TransactionPartition untuk satu bulan, dibaca dari file jika belum ada di cache"""
+        file_name = self._manifest["partitions"][month]["file"]
+        partition = self._partitions.get(file_name)
+        if partition is None:
+            partition = TransactionPartition(read_partition(os.path.join(self.directory, file_name)))
+            self._cache_partition(file_name, partition)
+        else:
+            self._partitions.move_to_end(file_name)
+        return partition
+
+    def _cache_partition(self, file_name, partition):
+        self._partitions[file_name] = partition
+        while len(self._partitions) > self.cache_size:
+            self._partitions.popitem(last=False)
+
+    @staticmethod
+    def _overlay(trans, month, overrides):
+        """Transaksi arsip dengan status terbaru dari jurnal"""
+        override = overrides.get(trans["id"])
+        if override is None or override[1] != month:
+            return trans
+        return FrozenDict({**trans, "status": override[0]})
+
+    def _months_with(self, statuses):
+        """Bulan yang mungkin berisi transaksi dengan salah satu status"""
+        moved = {month for status, month in self._overrides.values() if status in statuses}
+        partitions = self._manifest["partitions"]
+        return [
+            month for month in self._months
+            if month in moved or any(partitions[month]["statuses"].get(status) for status in statuses)
+        ]
+
+    def _find_month(self, trans_id):
+        """Bulan partisi yang berisi trans_id, None jika tidak ada di arsip"""
+        override = self._overrides.get(trans_id)
+        if override is not None:
+            return override[1]
+        hint = month_hint(trans_id)
+        months = list(reversed(self._months))
+        if hint in self._manifest["partitions"]:
+            months.remove(hint)
+            months.insert(0, hint)
+        for month in months:
+            if trans_id in self._partition(month).index:
+                return month
+        return None
+
+    def transactions(self):
+        """Semua transaksi (read-only), urut per bulan lalu sesuai waktu masuk
+
+        Membaca seluruh arsip; gunakan iter_chunks untuk memproses per potongan.
+        """
+        with self._exclusive():
+            self._refresh()
+            if self._view is None:
+                items = []
+                for month in self._months:
+                    items.extend(self._overlay(trans, month, self._overrides) for trans in self._partition(month).items)
+                items.extend(self._items)
+                self._view = tuple(items)
+            return self._view
+
+    def iter_chunks(self, chunk_size, statuses=None, months=None):
+        """Transaksi per potongan chunk_size, partisi yang belum di-cache dibaca per baris
+
+        Partisi tanpa transaksi berstatus statuses, atau di luar months
+        ((awal, akhir) YYYY-MM inklusif), dilewati tanpa dibuka.
+        """
+        with self._exclusive():
+            self._refresh()
+            selected = self._months if statuses is None else self._months_with(statuses)
+            if months is not None:
+                selected = [month for month in selected if months[0] <= month <= months[1]]
+            files = [(month, self._manifest["partitions"][month]["file"]) for month in selected]
+            overrides = dict(self._overrides)
+            tail = tuple(
+                trans for trans in self._items
+                if months is None or months[0] <= transaction_month(trans) <= months[1]
+            )
+
+        chunk = []
+        for month, file_name in files:
+            for trans in self._partition_items(month, file_name, overrides, statuses):
+                chunk.append(trans)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        for trans in tail:
+            if statuses is None or trans.get("status", "pending") in statuses:
+                chunk.append(trans)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def _partition_items(self, month, file_name, overrides, statuses=None):
+        """Transaksi satu partisi (status dari jurnal diterapkan), dibaca per baris jika belum di-cache"""
+        # File lama tetap ada sampai compaction berikutnya, jadi aman dibaca tanpa lock
+        partition = self._partitions.get(file_name)
+        source = partition.items if partition is not None else read_partition(
+            os.path.join(self.directory, file_name)
+        )
+        for trans in source:
+            trans = self._overlay(trans, month, overrides)
+            if statuses is None or trans.get("status", "pending") in statuses:
+                yield trans
+
+    def _partition_list(self, month, file_name, overrides, statuses=None):
+        return list(self._partition_items(month, file_name, overrides, statuses))
+
+    def segments(self, statuses=None):
+        """[(kunci, fungsi pemuat list transaksi)]: satu per partisi bulanan, lalu jurnal
+
+        File partisi tidak pernah diubah, jadi hasil olahan satu partisi boleh
+        di-cache selama kuncinya (nama file + perubahan status dari jurnal
+        untuk bulan itu) sama. Transaksi jurnal berkunci None.
+        """
+        with self._exclusive():
+            self._refresh()
+            months = self._months if statuses is None else self._months_with(statuses)
+            files = [(month, self._manifest["partitions"][month]["file"]) for month in months]
+            overrides = dict(self._overrides)
+            tail = [t for t in self._items if statuses is None or t.get("status", "pending") in statuses]
+
+        by_month = {}
+        for trans_id, (status, month) in overrides.items():
+            by_month.setdefault(month, []).append((trans_id, status))
+        segments = [
+            (
+                (file_name, tuple(sorted(by_month.get(month, ())))),
+                functools.partial(self._partition_list, month, file_name, overrides, statuses)
+            )
+            for month, file_name in files
+        ]
+        segments.append((None, lambda: tail))
+        return segments
+
+    def append(self, transaction):
+        """Tambahkan satu transaksi, hanya menulis record transaksi itu sendiri
+
+        Record pesanan langsung di-fsync (tidak menunggu batch) karena
+        checkout selesai begitu penulisan ini kembali.
+        """
+        with self._exclusive():
+            self._refresh()
+            self._write([{"op": "add", "data": transaction}], sync=True)
+            return self._seq
+
+    def version(self):
+        """Nomor urut record terakhir, bertambah setiap transaksi baru atau perubahan status"""
+        with self._exclusive():
+            self._refresh()
+            return self._seq
+
+    def get(self, trans_id):
+        """Cari transaksi berdasarkan id, None jika tidak ada"""
+        with self._exclusive():
+            self._refresh()
+            index = self._index.get(trans_id)
+            if index is not None:
+                return self._items[index]
+            month = self._find_month(trans_id)
+            if month is None:
+                return None
+            partition = self._partition(month)
+            return self._overlay(partition.items[partition.index[trans_id]], month, self._overrides)
+
+    def recent(self, limit):
+        """limit transaksi terakhir, urut dari yang terlama; hanya membuka partisi terbaru"""
+        with self._exclusive():
+            self._refresh()
+            result = self._items[-limit:] if limit > 0 else []
+            for month in reversed(self._months):
+                need = limit - len(result)
+                if need <= 0:
+                    break
+                items = self._partition(month).items[-need:]
+                result = [self._overlay(trans, month, self._overrides) for trans in items] + result
+            return result
+
+    def by_user(self, username, offset=0, limit=None):
+        """(transaksi milik username dari yang terbaru, jumlah total transaksi user)
+
+        Jumlah per partisi diambil dari manifest, sehingga partisi di luar
+        halaman yang diminta tidak dibuka.
+        """
+        with self._exclusive():
+            self._refresh()
+            positions = self._user_index.get(username, [])
+            sources = [(len(positions), lambda: [self._items[i] for i in reversed(positions)])]
+            for month in reversed(self._months):
+                count = self._manifest["partitions"][month]["users"].get(username, 0)
+                if count:
+                    sources.append((count, functools.partial(self._user_items, month, username)))
+            total = sum(count for count, _ in sources)
+
+            result = []
+            skip = offset
+            for count, load in sources:
+                if limit is not None and len(result) >= limit:
+                    break
+                if skip >= count:
+                    skip -= count
+                    continue
+                items = load()[skip:]
+                skip = 0
+                result.extend(items if limit is None else items[:limit - len(result)])
+            return result, total
+
+    def _user_items(self, month, username):
+        partition = self._partition(month)
+        return [
+            self._overlay(partition.items[i], month, self._overrides)
+            for i in reversed(partition.by_user.get(username, ()))
+        ]
+
+    def by_status(self, status):
+        """Transaksi dengan status tertentu, urut sesuai waktu masuk"""
+        with self._exclusive():
+            self._refresh()
+            result = []
+            for month in self._months_with({status}):
+                partition = self._partition(month)
+                positions = set(partition.by_status.get(status, ()))
+                positions.update(
+                    partition.index[trans_id] for trans_id, (_, override_month) in self._overrides.items()
+                    if override_month == month and trans_id in partition.index
+                )
+                for position in sorted(positions):
+                    trans = self._overlay(partition.items[position], month, self._overrides)
+                    if trans.get("status", "pending") == status:
+                        result.append(trans)
+            result.extend(self._items[i] for i in sorted(self._status_index.get(status, ())))
+            return result
+
+    def update_statuses(self, updates):
+        """Catat banyak perubahan status {id: status} dalam satu penulisan jurnal
+
+        Mengembalikan ({id: transaksi sebelum diubah, None jika tidak ditemukan},
+        versi setelah penulisan ini).
+        """
+        with self._exclusive():
+            self._refresh()
+            previous = {}
+            records = []
+            for trans_id, status in updates.items():
+                index = self._index.get(trans_id)
+                if index is not None:
+                    previous[trans_id] = self._items[index]
+                    records.append({"op": "status", "id": trans_id, "status": status})
+                    continue
+                month = self._find_month(trans_id)
+                if month is None:
+                    previous[trans_id] = None
+                    continue
+                partition = self._partition(month)
+                previous[trans_id] = self._overlay(partition.items[partition.index[trans_id]], month, self._overrides)
+                records.append({"op": "status", "id": trans_id, "status": status, "month": month})
+            if records:
+                self._write(records)
+            return previous, self._seq
+
+    def update_status(self, trans_id, status):
+        """Catat perubahan status; False jika transaksi tidak ditemukan"""
+        return self.update_statuses({trans_id: status})[0][trans_id] is not None
+
+    def _write(self, records, sync=False):
+        lines = []
+        for seq, record in enumerate(records, start=self._seq + 1):
+            lines.append(json.dumps({"seq": seq, **record}, ensure_ascii=False, separators=(',', ':')))
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        PROFILER.count_io(written=len(payload))
+        with open(self.journal_path, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            self._unsynced += len(records)
+            if (sync or self._unsynced >= self.fsync_batch
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._fsync(f)
+            elif self._sync_timer is None:
+                self._sync_timer = threading.Timer(self.fsync_interval, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+        
+        self._refresh()
+        if self._journal_records >= self.compact_every and not self._compaction_scheduled:
+            if self.schedule_compaction is None:
+                self.compact()
+            else:
+                self._compaction_scheduled = True
+                self.schedule_compaction()
+
+    def _fsync(self, f):
+        os.fsync(f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Paksa fsync record jurnal yang belum tersinkron"""
+        with self._lock:
+            self._sync_timer = None
+            if self._unsynced and os.path.exists(self.journal_path):
+                with open(self.journal_path, 'ab') as f:
+                    self._fsync(f)
+
+    def compact(self):
+        """Padatkan jurnal ke arsip: tulis ulang hanya partisi bulan yang berubah
+
+        Partisi bulan panas yang sudah melewati batas ikut ditulis ulang
+        dalam bentuk terkompresi. Lock hanya dipegang saat mengambil snapshot
+        dan saat mengganti manifest; file partisi baru ditulis tanpa lock,
+        dan record yang masuk selama itu tetap di jurnal.
+        """
+        with self._exclusive():
+            self._refresh()
+            partitions = thaw(self._manifest["partitions"])
+            cutoff = cold_month_cutoff()
+            cold = [month for month, entry in partitions.items()
+                    if month < cutoff and not entry["file"].endswith(".gz")]
+            if not self._items and not self._overrides and not cold:
+                return
+            changed = {}
+
+            def month_items(month):
+                if month not in changed:
+                    changed[month] = list(self._partition(month).items) if month in partitions else []
+                return changed[month]
+
+            for trans_id, (status, month) in self._overrides.items():
+                position = self._partition(month).index.get(trans_id)
+                if position is not None:
+                    items = month_items(month)
+                    items[position] = FrozenDict({**items[position], "status": status})
+            for trans in self._items:
+                month_items(transaction_month(trans)).append(trans)
+            for month in cold:
+                month_items(month)
+            seq, offset, manifest_key = self._seq, self._journal_offset, self._manifest_key
+
+        previous_files = {entry["file"] for entry in partitions.values()}
+        partitions.update(build_partitions(self.directory, changed, seq))
+
+        with self._exclusive():
+            self._refresh()
+            if self._manifest_key != manifest_key:
+                return  # sudah dipadatkan proses lain dari snapshot yang sama
+            atomic_write_json(self.manifest_path, {"seq": seq, "partitions": partitions})
+            self._truncate_journal(offset)
+            self._remove_stale_files(previous_files | {entry["file"] for entry in partitions.values()})
+
+            self._load_manifest()
+            for month, items in changed.items():
+                self._cache_partition(partitions[month]["file"], TransactionPartition(items))
+            self._refresh()
+
+    def _truncate_journal(self, offset):
+        """Ganti jurnal dengan record setelah byte offset (yang belum masuk arsip)"""
+        with open(self.journal_path, 'rb') as f:
+            f.seek(offset)
+            tail = f.read()
+        directory = os.path.dirname(os.path.abspath(self.journal_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.journal_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.journal_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._unsynced = 0
+
+    def _remove_stale_files(self, keep):
+        """Hapus file partisi yang tidak dipakai manifest saat ini maupun sebelumnya
+
+        File dari manifest sebelumnya disimpan satu generasi lagi untuk
+        pembaca iter_chunks yang masih berjalan tanpa lock.
+        """
+        for name in os.listdir(self.directory):
+            if name not in keep and (PARTITION_FILE_RE.match(name) or name.endswith(".tmp")):
+                os.remove(os.path.join(self.directory, name))
+
+@st.cache_resource
+def get_transaction_log():
+    """TransactionLog bersama untuk semua sesi dalam satu proses
+
+    Compaction dijalankan oleh antrian job agar tidak ditanggung checkout.
+    """
+    return TransactionLog(
+        TRANSACTIONS_JOURNAL, TRANSACTIONS_DIR,
+        schedule_compaction=lambda: enqueue_job("compact_transactions")
+    )
+
+def migrate_transactions():
+    """Migrasi satu kali dari transactions.json (list) atau snapshot lama ke arsip partisi bulanan
+
+    Tanpa data lama, arsip kosong (hanya manifest) dibuat. Manifest menandai
+    migrasi selesai, jadi transactions.json (data awal yang ikut di repo)
+    dibiarkan; hanya snapshot lama yang diganti nama menjadi .migrated.
+    """
+    if os.path.exists(TRANSACTIONS_MANIFEST):
+        return
+    os.makedirs(TRANSACTIONS_DIR, exist_ok=True)
+    source = next((path for path in (TRANSACTIONS_SNAPSHOT, TRANSACTIONS_FILE) if os.path.exists(path)), None)
+    seq = 0
+    transactions = []
+    try:
+        if source == TRANSACTIONS_SNAPSHOT:
+            snapshot = get_data_store().get(TRANSACTIONS_SNAPSHOT)
+            seq = snapshot.get("seq", 0)
+            transactions = snapshot.get("transactions", ())
+        elif source == TRANSACTIONS_FILE:
+            transactions = get_data_store().get(TRANSACTIONS_FILE)
+    except Exception as e:
+        st.error(f"Gagal migrasi {source}: {str(e)}")
+        return
+
+    by_month = {}
+    for trans in transactions:
+        by_month.setdefault(transaction_month(trans), []).append(trans)
+    partitions = build_partitions(TRANSACTIONS_DIR, by_month, seq)
+    atomic_write_json(TRANSACTIONS_MANIFEST, {"seq": seq, "partitions": partitions})
+    if source == TRANSACTIONS_SNAPSHOT:
+        os.replace(source, source + ".migrated")
+        get_data_store().invalidate(source)
+
+def load_transactions():
+    """Memuat semua transaksi (read-only) dari arsip + jurnal"""
+    try:
+        return get_transaction_log().transactions()
+    except Exception as e:
+        st.error(f"Gagal memuat transaksi: {str(e)}")
+        return ()
+
+# ====================== BACKEND PENYIMPANAN ======================
+class InsufficientStockError(Exception):
+    """Stok tidak cukup untuk satu atau lebih produk di keranjang"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages  # {product_id: stok yang tersedia}
+        super().__init__(f"Stok tidak cukup untuk produk {sorted(shortages)}")
+
+class Storage:
+    """Antarmuka backend penyimpanan produk, transaksi dan user
+
+    Semua method baca mengembalikan data read-only (lihat freeze).
+    """
+
+    def load_products(self):
+        raise NotImplementedError
+
+    def catalog_version(self):
+        """Nomor versi katalog (murah dibaca), naik setiap kali produk ditulis"""
+        raise NotImplementedError
+
+    def add_product(self, product):
+        raise NotImplementedError
+
+    def update_product(self, product_id, changes):
+        """Ubah field produk; False jika produk tidak ditemukan"""
+        raise NotImplementedError
+
+    def delete_product(self, product_id):
+        raise NotImplementedError
+
+    def reserve_stock(self, quantities):
+        """Kurangi stok untuk {product_id: jumlah} secara atomik
+
+        Jika ada produk yang stoknya kurang, tidak ada stok yang diubah dan
+        InsufficientStockError dilempar. Mengembalikan {product_id: stok setelah reservasi}.
+        """
+        raise NotImplementedError
+
+    def release_stock(self, quantities):
+        """Kembalikan stok yang sudah direservasi"""
+        raise NotImplementedError
+
+    def load_transactions(self):
+        raise NotImplementedError
+
+    def transactions_version(self):
+        """Penanda perubahan transaksi, bertambah 1 per transaksi baru atau perubahan status"""
+        raise NotImplementedError
+
+    def recent_transactions(self, limit):
+        """limit transaksi terakhir, urut dari yang terlama"""
+        raise NotImplementedError
+
+    def iter_transactions(self, chunk_size, statuses=None, months=None):
+        """Transaksi per potongan (list, maksimal chunk_size), urut dari yang terlama
+
+        statuses membatasi status yang diambil (None = semua status), months
+        membatasi bulan transaksi ((awal, akhir) YYYY-MM inklusif, None = semua).
+        """
+        raise NotImplementedError
+
+    def transaction_segments(self, statuses=None):
+        """Transaksi dalam potongan yang bisa di-cache: [(kunci, fungsi pemuat list transaksi)]
+
+        Kunci yang sama menjamin isi potongan sama; kunci None berarti isinya
+        bisa berubah di setiap versi. Default: satu potongan berkunci None.
+        """
+        def load():
+            return [trans for chunk in self.iter_transactions(EXPORT_CHUNK_SIZE, statuses) for trans in chunk]
+        return [(None, load)]
+
+    def get_transaction(self, trans_id):
+        raise NotImplementedError
+
+    def user_transactions(self, username, offset=0, limit=None):
+        """(transaksi milik satu user dari yang terbaru, jumlah total transaksi user)"""
+        raise NotImplementedError
+
+    def add_transaction(self, transaction):
+        """Simpan transaksi baru, kembalikan transactions_version setelah penulisan ini"""
+        raise NotImplementedError
+
+    def transactions_by_status(self, status):
+        """Transaksi dengan status tertentu, urut dari yang terlama"""
+        raise NotImplementedError
+
+    def update_transaction_statuses(self, updates):
+        """Ubah status banyak transaksi {id: status} dalam satu penulisan
+
+        Mengembalikan ({id: transaksi sebelum diubah, None jika tidak ditemukan},
+        transactions_version setelah penulisan ini).
+        """
+        raise NotImplementedError
+
+    def update_transaction_status(self, trans_id, status):
+        """Ubah status transaksi; False jika transaksi tidak ditemukan"""
+        return self.update_transaction_statuses({trans_id: status})[0][trans_id] is not None
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def get_user(self, username):
+        raise NotImplementedError
+
+    def add_user(self, user):
+        raise NotImplementedError
+
+    def update_user(self, username, changes):
+        """Ubah field user; False jika user tidak ditemukan"""
+        raise NotImplementedError
+
+    def delete_user(self, username):
+        raise NotImplementedError
+
+    def load_cart(self, username):
+        """Keranjang tersimpan milik user sebagai ({product_id: jumlah}, {product_id: harga saat ditambahkan})"""
+        raise NotImplementedError
+
+    def save_cart(self, username, items, prices):
+        """Simpan keranjang {product_id: jumlah} beserta harga yang dilihat user; keranjang kosong dihapus"""
+        raise NotImplementedError
+
+@profile_methods
+class JsonStorage(Storage):
+    """Backend default: file JSON di folder data/"""
+
+    def __init__(self):
+        self._users_index = (None, {})  # (list user yang di-index, username -> user)
+
+    def load_products(self):
+        return load_from_json(PRODUCTS_FILE)
+
+    def catalog_version(self):
+        state = self._catalog_state()
+        if state is None or tuple(state["products_key"]) != DataStore._key(PRODUCTS_FILE):
+            # products.json ditulis di luar aplikasi atau proses mati sebelum versi dinaikkan
+            with file_lock(PRODUCTS_FILE):
+                state = self._catalog_state()
+                if state is None or tuple(state["products_key"]) != DataStore._key(PRODUCTS_FILE):
+                    state = self._bump_catalog_version()
+        return state["version"]
+
+    @staticmethod
+    def _catalog_state():
+        try:
+            return get_data_store().get(CATALOG_VERSION_FILE)
+        except FileNotFoundError:
+            return None
+
+    def _bump_catalog_version(self):
+        # Dipanggil dengan file_lock(PRODUCTS_FILE) setelah products.json ditulis;
+        # products_key mencatat versi file yang sudah tercakup nomor versi ini
+        state = self._catalog_state()
+        state = {
+            "version": (state["version"] if state else 0) + 1,
+            "products_key": list(DataStore._key(PRODUCTS_FILE))
+        }
+        get_data_store().put(CATALOG_VERSION_FILE, state, atomic_write_json(CATALOG_VERSION_FILE, state))
+        return state
+
+    def _save_products(self, products):
+        save_to_json(PRODUCTS_FILE, products)
+        self._bump_catalog_version()
+
+    def add_product(self, product):
+        with file_lock(PRODUCTS_FILE):
+            products = load_from_json(PRODUCTS_FILE, mutable=True)
+            products.append(product)
+            self._save_products(products)
+
+    def update_product(self, product_id, changes):
+        with file_lock(PRODUCTS_FILE):
+            products = load_from_json(PRODUCTS_FILE, mutable=True)
+            for product in products:
+                if product["id"] == product_id:
+                    product.update(changes)
+                    self._save_products(products)
+                    return True
+        return False
+
+    def delete_product(self, product_id):
+        with file_lock(PRODUCTS_FILE):
+            products = load_from_json(PRODUCTS_FILE, mutable=True)
+            self._save_products([p for p in products if p["id"] != product_id])
+
+    def _adjust_stock(self, quantities, sign):
+        # Dipanggil dengan file_lock(PRODUCTS_FILE); kesalahan tulis diteruskan ke pemanggil
+        store = get_data_store()
+        products = thaw(store.get(PRODUCTS_FILE))
+        by_id = {p["id"]: p for p in products}
+        if sign < 0:
+            shortages = {
+                product_id: by_id[product_id]["stock"] if product_id in by_id else 0
+                for product_id, quantity in quantities.items()
+                if product_id not in by_id or by_id[product_id]["stock"] < quantity
+            }
+            if shortages:
+                raise InsufficientStockError(shortages)
+        for product_id, quantity in quantities.items():
+            if product_id in by_id:
+                by_id[product_id]["stock"] += sign * quantity
+        store.put(PRODUCTS_FILE, products, atomic_write_json(PRODUCTS_FILE, products, indent=4))
+        self._bump_catalog_version()
+        return {product_id: by_id[product_id]["stock"] for product_id in quantities if product_id in by_id}
+
+    def reserve_stock(self, quantities):
+        with file_lock(PRODUCTS_FILE):
+            return self._adjust_stock(quantities, -1)
+
+    def release_stock(self, quantities):
+        with file_lock(PRODUCTS_FILE):
+            self._adjust_stock(quantities, 1)
+
+    def load_transactions(self):
+        return load_transactions()
+
+    def transactions_version(self):
+        return get_transaction_log().version()
+
+    def recent_transactions(self, limit):
+        return get_transaction_log().recent(limit)
+
+    def iter_transactions(self, chunk_size, statuses=None, months=None):
+        return get_transaction_log().iter_chunks(chunk_size, statuses, months)
+
+    def transaction_segments(self, statuses=None):
+        return get_transaction_log().segments(statuses)
+
+    def get_transaction(self, trans_id):
+        return get_transaction_log().get(trans_id)
+
+    def user_transactions(self, username, offset=0, limit=None):
+        return get_transaction_log().by_user(username, offset, limit)
+
+    def add_transaction(self, transaction):
+        return get_transaction_log().append(transaction)
+
+    def transactions_by_status(self, status):
+        return get_transaction_log().by_status(status)
+
+    def update_transaction_statuses(self, updates):
+        return get_transaction_log().update_statuses(updates)
+
+    def load_users(self):
+        return load_from_json(USERS_FILE)
+
+    def _users_by_name(self):
+        """Index username -> user, dibangun ulang hanya jika isi users.json berubah
+
+        load_from_json mengembalikan objek yang sama selama file tidak berubah,
+        dan save_to_json menggantinya dengan objek baru, sehingga identitas
+        list cukup sebagai penanda versi.
+        """
+        users = self.load_users()
+        source, index = self._users_index
+        if source is not users:
+            index = {u["username"]: u for u in users}
+            self._users_index = (users, index)
+        return index
+
+    def get_user(self, username):
+        return self._users_by_name().get(username)
+
+    def add_user(self, user):
+        with file_lock(USERS_FILE):
+            users = load_from_json(USERS_FILE, mutable=True)
+            users.append(user)
+            save_to_json(USERS_FILE, users)
+
+    def update_user(self, username, changes):
+        with file_lock(USERS_FILE):
+            users = load_from_json(USERS_FILE, mutable=True)
+            for user in users:
+                if user["username"] == username:
+                    user.update(changes)
+                    save_to_json(USERS_FILE, users)
+                    return True
+        return False
+
+    def delete_user(self, username):
+        with file_lock(USERS_FILE):
+            users = load_from_json(USERS_FILE, mutable=True)
+            save_to_json(USERS_FILE, [u for u in users if u["username"] != username])
+
+    @staticmethod
+    def _cart_path(username):
+        # Nama file dari hash agar username apa pun aman dipakai sebagai path
+        return os.path.join(CART_DIR, hashlib.sha256(username.encode('utf-8')).hexdigest()[:32] + ".json")
+
+    def load_cart(self, username):
+        try:
+            with open(self._cart_path(username), 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return {}, {}
+        PROFILER.count_io(read=len(content))
+        return cart_from_rows(PROFILER.parse_json(content))
+
+    def save_cart(self, username, items, prices):
+        path = self._cart_path(username)
+        if items:
+            atomic_write_json(path, cart_rows(items, prices))
+        elif os.path.exists(path):
+            os.remove(path)
+
+@profile_methods
+class SqliteStorage(Storage):
+    """Backend SQLite dengan index untuk lookup per user, id dan status
+
+    Kolom yang dipakai untuk pencarian (stok, username, status) disimpan
+    terpisah, sisanya disimpan utuh sebagai JSON di kolom data.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            category TEXT NOT NULL,
+            stock INTEGER NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+
+        CREATE TABLE IF NOT EXISTS transactions (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            status TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_id ON transactions(id);
+        CREATE INDEX IF NOT EXISTS idx_transactions_username ON transactions(username);
+        CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions(status);
+
+        -- PRIMARY KEY sekaligus menjadi index users(username)
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS carts (
+            username TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self):
+        """Satu koneksi per thread (Streamlit menjalankan tiap sesi di thread sendiri)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _dumps(data):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        PROFILER.count_io(written=len(payload))
+        return payload
+
+    @staticmethod
+    def _loads(data):
+        PROFILER.count_io(read=len(data))
+        return PROFILER.parse_json(data)
+
+    @classmethod
+    def _product(cls, row):
+        stock, data = row
+        product = cls._loads(data)
+        product["stock"] = stock
+        return freeze(product)
+
+    @classmethod
+    def _transaction(cls, row):
+        status, data = row
+        trans = cls._loads(data)
+        trans["status"] = status
+        return freeze(trans)
+
+    @staticmethod
+    def _bump_version(conn, key, amount=1):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (key, amount)
+        )
+
+    def _version(self, key):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def is_empty(self):
+        conn = self._connect()
+        return not any(
+            conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+            for table in ("products", "transactions", "users")
+        )
+
+    def import_from(self, storage):
+        """Salin semua data dari backend lain (dipakai saat database baru dibuat)"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO products (id, category, stock, data) VALUES (?, ?, ?, ?)",
+                [(p["id"], p["category"], p["stock"], self._dumps(p)) for p in storage.load_products()]
+            )
+            self._bump_version(conn, "catalog_version")
+            cursor = conn.executemany(
+                "INSERT INTO transactions (id, username, status, data) VALUES (?, ?, ?, ?)",
+                [(t["id"], t["username"], t.get("status", "pending"), self._dumps(t))
+                 for t in storage.load_transactions()]
+            )
+            self._bump_version(conn, "transactions_version", max(cursor.rowcount, 1))
+            conn.executemany(
+                "INSERT OR REPLACE INTO users (username, data) VALUES (?, ?)",
+                [(u["username"], self._dumps(u)) for u in storage.load_users()]
+            )
+
+    def load_products(self):
+        rows = self._connect().execute("SELECT stock, data FROM products ORDER BY id")
+        return tuple(self._product(row) for row in rows)
+
+    def catalog_version(self):
+        return self._version("catalog_version")
+
+    def add_product(self, product):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO products (id, category, stock, data) VALUES (?, ?, ?, ?)",
+                (product["id"], product["category"], product["stock"], self._dumps(product))
+            )
+            self._bump_version(conn, "catalog_version")
+
+    def update_product(self, product_id, changes):
+        conn = self._connect()
+        with conn:
+            row = conn.execute("SELECT stock, data FROM products WHERE id = ?", (product_id,)).fetchone()
+            if row is None:
+                return False
+            product = thaw(self._product(row))
+            product.update(changes)
+            conn.execute(
+                "UPDATE products SET category = ?, stock = ?, data = ? WHERE id = ?",
+                (product["category"], product["stock"], self._dumps(product), product_id)
+            )
+            self._bump_version(conn, "catalog_version")
+        return True
+
+    def delete_product(self, product_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            self._bump_version(conn, "catalog_version")
+
+    def reserve_stock(self, quantities):
+        conn = self._connect()
+        with conn:  # rollback otomatis jika InsufficientStockError
+            shortages = {}
+            for product_id, quantity in quantities.items():
+                cursor = conn.execute(
+                    "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                    (quantity, product_id, quantity)
+                )
+                if cursor.rowcount == 0:
+                    row = conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()
+                    shortages[product_id] = row[0] if row else 0
+            if shortages:
+                raise InsufficientStockError(shortages)
+            self._bump_version(conn, "catalog_version")
+            return {
+                product_id: conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()[0]
+                for product_id in quantities
+            }
+
+    def release_stock(self, quantities):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "UPDATE products SET stock = stock + ? WHERE id = ?",
+                [(quantity, product_id) for product_id, quantity in quantities.items()]
+            )
+            self._bump_version(conn, "catalog_version")
+
+    def load_transactions(self):
+        rows = self._connect().execute("SELECT status, data FROM transactions ORDER BY seq")
+        return tuple(self._transaction(row) for row in rows)
+
+    def transactions_version(self):
+        return self._version("transactions_version")
+
+    def recent_transactions(self, limit):
+        rows = self._connect().execute(
+            "SELECT status, data FROM transactions ORDER BY seq DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._transaction(row) for row in reversed(rows)]
+
+    def iter_transactions(self, chunk_size, statuses=None, months=None):
+        conditions, params = [], ()
+        if statuses is not None:
+            params = tuple(statuses)
+            conditions.append(f"status IN ({', '.join('?' * len(params))})")
+        if months is not None:
+            # Tanggal disimpan dd/mm/YYYY di data, bulan disusun ulang menjadi YYYY-MM
+            params += tuple(months)
+            conditions.append(
+                "substr(json_extract(data, '$.date'), 7, 4) || '-' || "
+                "substr(json_extract(data, '$.date'), 4, 2) BETWEEN ? AND ?"
+            )
+        query = "SELECT status, data FROM transactions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        cursor = self._connect().execute(query + " ORDER BY seq", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [self._transaction(row) for row in rows]
+
+    def get_transaction(self, trans_id):
+        row = self._connect().execute(
+            "SELECT status, data FROM transactions WHERE id = ? ORDER BY seq LIMIT 1", (trans_id,)
+        ).fetchone()
+        return self._transaction(row) if row else None
+
+    def user_transactions(self, username, offset=0, limit=None):
+        conn = self._connect()
+        # Index username juga memuat rowid (seq), jadi pengurutan tidak butuh sort tambahan
+        rows = conn.execute(
+            "SELECT status, data FROM transactions WHERE username = ? ORDER BY seq DESC LIMIT ? OFFSET ?",
+            (username, -1 if limit is None else limit, offset)
+        )
+        total = conn.execute("SELECT COUNT(*) FROM transactions WHERE username = ?", (username,)).fetchone()[0]
+        return [self._transaction(row) for row in rows], total
+
+    def add_transaction(self, transaction):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO transactions (id, username, status, data) VALUES (?, ?, ?, ?)",
+                (transaction["id"], transaction["username"], transaction["status"], self._dumps(transaction))
+            )
+            self._bump_version(conn, "transactions_version")
+            return conn.execute("SELECT value FROM meta WHERE key = 'transactions_version'").fetchone()[0]
+
+    def transactions_by_status(self, status):
+        rows = self._connect().execute(
+            "SELECT status, data FROM transactions WHERE status = ? ORDER BY seq", (status,)
+        )
+        return [self._transaction(row) for row in rows]
+
+    def update_transaction_statuses(self, updates):
+        conn = self._connect()
+        previous = {}
+        with conn:
+            for trans_id, status in updates.items():
+                row = conn.execute(
+                    "SELECT seq, status, data FROM transactions WHERE id = ? ORDER BY seq LIMIT 1",
+                    (trans_id,)
+                ).fetchone()
+                if row is None:
+                    previous[trans_id] = None
+                    continue
+                previous[trans_id] = self._transaction(row[1:])
+                conn.execute("UPDATE transactions SET status = ? WHERE seq = ?", (status, row[0]))
+            updated = sum(1 for trans in previous.values() if trans is not None)
+            if updated:
+                self._bump_version(conn, "transactions_version", updated)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'transactions_version'").fetchone()
+        return previous, row[0] if row else 0
+
+    def load_users(self):
+        rows = self._connect().execute("SELECT data FROM users ORDER BY rowid")
+        return tuple(freeze(self._loads(data)) for (data,) in rows)
+
+    def get_user(self, username):
+        row = self._connect().execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+        return freeze(self._loads(row[0])) if row else None
+
+    def add_user(self, user):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO users (username, data) VALUES (?, ?)",
+                (user["username"], self._dumps(user))
+            )
+
+    def update_user(self, username, changes):
+        conn = self._connect()
+        with conn:
+            row = conn.execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return False
+            user = self._loads(row[0])
+            user.update(changes)
+            conn.execute("UPDATE users SET data = ? WHERE username = ?", (self._dumps(user), username))
+        return True
+
+    def delete_user(self, username):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM users WHERE username = ?", (username,))
+
+    def load_cart(self, username):
+        row = self._connect().execute("SELECT data FROM carts WHERE username = ?", (username,)).fetchone()
+        return cart_from_rows(self._loads(row[0])) if row else ({}, {})
+
+    def save_cart(self, username, items, prices):
+        conn = self._connect()
+        with conn:
+            if items:
+                conn.execute(
+                    "INSERT INTO carts (username, data) VALUES (?, ?) "
+                    "ON CONFLICT(username) DO UPDATE SET data = excluded.data",
+                    (username, self._dumps(cart_rows(items, prices)))
+                )
+            else:
+                conn.execute("DELETE FROM carts WHERE username = ?", (username,))
+
+@st.cache_resource
+def get_storage(backend=STORAGE_BACKEND):
+    """Backend penyimpanan aktif sesuai STORAGE_BACKEND"""
+    if backend == "service":
+        return ServiceStorage(DataServiceClient(DATA_SERVICE_ADDRESS))
+    if backend == "json":
+        return JsonStorage()
+    if backend == "sqlite":
+        storage = SqliteStorage(SQLITE_DB)
+        if storage.is_empty():
+            storage.import_from(JsonStorage())
+        return storage
+    raise ValueError(f"Backend penyimpanan tidak dikenal: {backend}")
+
+# ====================== LAYANAN DATA ======================
+# Protokol: frame = panjang (4 byte, big-endian) + JSON UTF-8. Permintaan
+# {"method", "args", "kwargs"}; jawaban {"result"} atau {"error"}, method
+# generator (iter_transactions) menjawab beberapa {"chunk"} lalu {"done"}.
+WIRE_PAIRS = "__pairs__"
+FRAME_HEADER = struct.Struct(">I")
+
+# Method Storage yang boleh dipanggil lewat layanan (transaction_segments mengembalikan
+# fungsi, jadi worker memakai versi default di atas iter_transactions), dan yang menulis data
+DATA_SERVICE_METHODS = frozenset(
+    name for name, value in vars(Storage).items() if not name.startswith("_") and callable(value)
+) - {"transaction_segments"}
+DATA_SERVICE_WRITES = frozenset({
+    "add_product", "update_product", "delete_product", "reserve_stock", "release_stock",
+    "add_transaction", "update_transaction_statuses", "update_transaction_status",
+    "add_user", "update_user", "delete_user", "save_cart"
+})
+
+# Bacaan besar yang di-cache per versi: method -> method versi
+DATA_SERVICE_CACHED = {"load_products": "catalog_version", "load_transactions": "transactions_version"}
+
+class DataServiceError(Exception):
+    """Layanan data tidak bisa dihubungi atau gagal menjalankan permintaan"""
+
+def to_wire(data):
+    """Data -> struktur JSON; dict dengan key non-string (mis. {product_id: jumlah}) dikirim sebagai pasangan"""
+    if isinstance(data, dict):
+        if all(isinstance(key, str) for key in data):
+            return {key: to_wire(value) for key, value in data.items()}
+        return {WIRE_PAIRS: [[to_wire(key), to_wire(value)] for key, value in data.items()]}
+    if isinstance(data, (list, tuple, set, frozenset)):
+        return [to_wire(value) for value in data]
+    return data
+
+def from_wire(data, mutable=False):
+    """Kebalikan to_wire, langsung read-only (lihat freeze) kecuali mutable=True"""
+    mapping, sequence = (dict, list) if mutable else (FrozenDict, tuple)
+    if isinstance(data, dict):
+        if len(data) == 1 and WIRE_PAIRS in data:
+            return mapping((from_wire(key, mutable), from_wire(value, mutable)) for key, value in data[WIRE_PAIRS])
+        return mapping((key, from_wire(value, mutable)) for key, value in data.items())
+    if isinstance(data, list):
+        return sequence(from_wire(value, mutable) for value in data)
+    return data
+
+def encode_frame(message):
+    payload = json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def read_frame(stream):
+    """Payload satu frame (bytes), None jika koneksi ditutup di antara frame"""
+    header = stream.read(FRAME_HEADER.size)
+    if not header:
+        return None
+    if len(header) < FRAME_HEADER.size:
+        raise ConnectionError("Koneksi layanan data terputus")
+    size, = FRAME_HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise ConnectionError("Koneksi layanan data terputus")
+    return payload
+
+def parse_service_address(address):
+    """"unix:/path" -> (AF_UNIX, path), "host:port" -> (AF_INET, (host, port))
+
+    Protokol layanan tidak memakai autentikasi, jadi host TCP harus loopback.
+    """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    host = host or "127.0.0.1"
+    if host != "localhost":
+        try:
+            loopback = ipaddress.IPv4Address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise DataServiceError(f"Layanan data hanya boleh di localhost atau 127.0.0.0/8, bukan {host}")
+    return socket.AF_INET, (host, int(port))
+
+class DataService:
+    """Pemilik tunggal produk, transaksi dan user untuk banyak proses worker
+
+    Penulisan dijalankan satu per satu; bacaan berjalan paralel. Hasil
+    load_products/load_transactions disimpan dalam bentuk siap kirim per
+    versi, dan tidak dikirim ulang jika versi milik klien masih sama.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._write_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._responses = {}  # method -> (versi, payload JSON hasil)
+
+    def handle(self, request, stream):
+        """Jalankan satu permintaan dan tulis jawabannya ke stream"""
+        method = request.get("method")
+        try:
+            if method not in DATA_SERVICE_METHODS:
+                raise DataServiceError(f"Method tidak dikenal: {method}")
+            if method in DATA_SERVICE_CACHED and not request.get("args"):
+                stream.write(self._cached_read(method, request.get("version")))
+                return
+            args = from_wire(request.get("args", []), mutable=True)
+            kwargs = from_wire(request.get("kwargs", {}), mutable=True)
+            if method in DATA_SERVICE_WRITES:
+                with self._write_lock:
+                    result = getattr(self.storage, method)(*args, **kwargs)
+            else:
+                result = getattr(self.storage, method)(*args, **kwargs)
+            if inspect.isgenerator(result):
+                for chunk in result:
+                    stream.write(encode_frame({"chunk": to_wire(chunk)}))
+                stream.write(encode_frame({"done": True}))
+            else:
+                stream.write(encode_frame({"result": to_wire(result)}))
+        except Exception as e:
+            error = {"type": type(e).__name__, "message": str(e)}
+            if isinstance(e, InsufficientStockError):
+                error["shortages"] = to_wire(e.shortages)
+            stream.write(encode_frame({"error": error}))
+
+    def _cached_read(self, method, version):
+        current = getattr(self.storage, DATA_SERVICE_CACHED[method])()
+        if version is not None and version == current:
+            return encode_frame({"version": current, "unchanged": True})
+        with self._cache_lock:
+            cached = self._responses.get(method)
+        if cached is None or cached[0] != current:
+            result = getattr(self.storage, method)()
+            cached = (current, json.dumps(to_wire(result), ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            with self._cache_lock:
+                self._responses[method] = cached
+        payload = b'{"version":' + json.dumps(current).encode('utf-8') + b',"result":' + cached[1] + b'}'
+        return FRAME_HEADER.pack(len(payload)) + payload
+
+class DataServiceHandler(socketserver.StreamRequestHandler):
+    """Satu koneksi worker; dilayani di thread sendiri sampai worker menutupnya"""
+
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                payload = read_frame(self.rfile)
+            except ConnectionError:
+                return
+            if payload is None:
+                return
+            try:
+                service.handle(json.loads(payload), self.wfile)
+                self.wfile.flush()
+            except OSError:
+                return  # worker menutup koneksi di tengah jawaban (mis. iterasi dihentikan)
+
+def make_data_server(address, service):
+    """Server socket (Unix atau TCP localhost) untuk service, thread per koneksi"""
+    family, location = parse_service_address(address)
+    if family == socket.AF_INET:
+        server_class = type("DataServer", (socketserver.ThreadingTCPServer,), {"allow_reuse_address": True})
+    else:
+        if os.path.exists(location):
+            try:
+                with socket.socket(socket.AF_UNIX) as probe:
+                    probe.connect(location)
+            except OSError:
+                os.remove(location)  # sisa layanan yang sudah mati
+            else:
+                raise DataServiceError(f"Layanan data sudah berjalan di {address}")
+        server_class = socketserver.ThreadingUnixStreamServer
+    server = server_class(location, DataServiceHandler, bind_and_activate=False)
+    try:
+        server.server_bind()
+        if family == socket.AF_UNIX:
+            # Hanya pemilik (user yang menjalankan worker) yang boleh terhubung, diatur sebelum listen
+            os.chmod(location, 0o600)
+        server.server_activate()
+    except BaseException:
+        server.server_close()
+        raise
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def serve_data_service(address=DATA_SERVICE_ADDRESS, backend="json"):
+    """Jalankan layanan data sampai dihentikan (Ctrl+C)"""
+    if backend == "service":
+        raise ValueError("Layanan data membutuhkan backend json atau sqlite")
+    if not setup_is_current():
+        setup_files()
+    server = make_data_server(address, DataService(get_storage(backend)))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        family, location = parse_service_address(address)
+        if family != socket.AF_INET and os.path.exists(location):
+            os.remove(location)
+
+class DataServiceClient:
+    """Klien layanan data dengan pool koneksi, dipakai bersama oleh semua sesi dalam satu proses"""
+
+    def __init__(self, address, pool_size=DATA_SERVICE_POOL_SIZE, timeout=DATA_SERVICE_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._reset_pool()
+        if hasattr(os, "register_at_fork"):
+            # Proses hasil fork tidak boleh memakai socket milik proses induk
+            os.register_at_fork(after_in_child=self._reset_pool)
+
+    def _reset_pool(self):
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def _connect(self):
+        family, location = parse_service_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(location)
+            if family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            sock.close()
+            raise DataServiceError(f"Layanan data di {self.address} tidak bisa dihubungi: {e}") from e
+        return sock, sock.makefile('rwb')
+
+    def _checkout(self):
+        """(koneksi, True jika koneksi lama dari pool)"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise DataServiceError("Semua koneksi layanan data sedang dipakai")
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        try:
+            return self._connect(), False
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkin(self, conn, broken=False):
+        if broken:
+            sock, stream = conn
+            stream.close()
+            sock.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def _exchange(self, conn, request):
+        sock, stream = conn
+        stream.write(request)
+        stream.flush()
+        payload = read_frame(stream)
+        if payload is None:
+            raise ConnectionError("Layanan data menutup koneksi")
+        PROFILER.count_io(read=len(payload), written=len(request))
+        return PROFILER.parse_json(payload)
+
+    def request(self, message):
+        """Kirim satu permintaan, kembalikan jawaban mentah
+
+        Koneksi lama yang ternyata sudah putus (layanan di-restart) dicoba
+        ulang sekali dengan koneksi baru, kecuali untuk penulisan karena
+        tidak diketahui apakah penulisan sudah dijalankan.
+        """
+        request = encode_frame(message)
+        while True:
+            conn, reused = self._checkout()
+            try:
+                response = self._exchange(conn, request)
+            except OSError as e:
+                self._checkin(conn, broken=True)
+                if reused and message["method"] not in DATA_SERVICE_WRITES:
+                    continue
+                raise DataServiceError(f"Koneksi ke layanan data gagal: {e}") from e
+            self._checkin(conn)
+            return self._check(response)
+
+    @staticmethod
+    def _check(response):
+        error = response.get("error")
+        if error is None:
+            return response
+        if error["type"] == "InsufficientStockError":
+            raise InsufficientStockError(from_wire(error["shortages"], mutable=True))
+        raise DataServiceError(f"{error['type']}: {error['message']}")
+
+    def call(self, method, *args, **kwargs):
+        """Panggil method Storage di layanan, hasil read-only"""
+        response = self.request({"method": method, "args": to_wire(args), "kwargs": to_wire(kwargs)})
+        return from_wire(response["result"])
+
+    def stream(self, method, *args, **kwargs):
+        """Panggil method generator di layanan, hasil diterima per potongan"""
+        request = encode_frame({"method": method, "args": to_wire(args), "kwargs": to_wire(kwargs)})
+        conn, _ = self._checkout()
+        finished = False
+        try:
+            sock, stream = conn
+            stream.write(request)
+            stream.flush()
+            while True:
+                payload = read_frame(stream)
+                if payload is None:
+                    raise ConnectionError("Layanan data menutup koneksi")
+                PROFILER.count_io(read=len(payload))
+                response = PROFILER.parse_json(payload)
+                if "chunk" not in response:
+                    finished = True
+                    self._check(response)
+                    return
+                yield from_wire(response["chunk"])
+        except OSError as e:
+            raise DataServiceError(f"Koneksi ke layanan data gagal: {e}") from e
+        finally:
+            # Iterasi yang dihentikan di tengah meninggalkan frame belum dibaca
+            self._checkin(conn, broken=not finished)
+
+@profile_methods
+class ServiceStorage(Storage):
+    """Backend mode multi-proses: semua operasi diteruskan ke layanan data
+
+    load_products/load_transactions disimpan per versi di proses worker,
+    jadi selama versi tidak berubah layanan hanya menjawab "unchanged".
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._cached = {}  # method -> (versi, hasil read-only)
+
+    def _cached_read(self, method):
+        version, result = self._cached.get(method, (None, None))
+        response = self.client.request({"method": method, "version": version})
+        if not response.get("unchanged"):
+            version, result = response["version"], from_wire(response["result"])
+            self._cached[method] = (version, result)
+        return result
+
+    def load_products(self):
+        return self._cached_read("load_products")
+
+    def catalog_version(self):
+        return self.client.call("catalog_version")
+
+    def add_product(self, product):
+        return self.client.call("add_product", product)
+
+    def update_product(self, product_id, changes):
+        return self.client.call("update_product", product_id, changes)
+
+    def delete_product(self, product_id):
+        return self.client.call("delete_product", product_id)
+
+    def reserve_stock(self, quantities):
+        return self.client.call("reserve_stock", quantities)
+
+    def release_stock(self, quantities):
+        return self.client.call("release_stock", quantities)
+
+    def load_transactions(self):
+        return self._cached_read("load_transactions")
+
+    def transactions_version(self):
+        return self.client.call("transactions_version")
+
+    def recent_transactions(self, limit):
+        return self.client.call("recent_transactions", limit)
+
+    def iter_transactions(self, chunk_size, statuses=None, months=None):
+        return self.client.stream("iter_transactions", chunk_size, statuses, months)
+
+    def get_transaction(self, trans_id):
+        return self.client.call("get_transaction", trans_id)
+
+    def user_transactions(self, username, offset=0, limit=None):
+        return self.client.call("user_transactions", username, offset, limit)
+
+    def add_transaction(self, transaction):
+        return self.client.call("add_transaction", transaction)
+
+    def transactions_by_status(self, status):
+        return self.client.call("transactions_by_status", status)
+
+    def update_transaction_statuses(self, updates):
+        return self.client.call("update_transaction_statuses", updates)
+
+    def load_users(self):
+        return self.client.call("load_users")
+
+    def get_user(self, username):
+        return self.client.call("get_user", username)
+
+    def add_user(self, user):
+        return self.client.call("add_user", user)
+
+    def update_user(self, username, changes):
+        return self.client.call("update_user", username, changes)
+
+    def delete_user(self, username):
+        return self.client.call("delete_user", username)
+
+    def load_cart(self, username):
+        return self.client.call("load_cart", username)
+
+    def save_cart(self, username, items, prices):
+        return self.client.call("save_cart", username, items, prices)
+
+# ====================== HASH PASSWORD ======================
+PASSWORD_HASH_SCHEME = "pbkdf2_sha256"
+
+def hash_password(password, iterations=None):
+    """Hash password dengan salt acak: "pbkdf2_sha256$iterasi$salt$hash" (hex)"""
+    iterations = iterations or PASSWORD_HASH_ITERATIONS
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'), salt, iterations)
+    return f"{PASSWORD_HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, stored):
+    """Cocokkan password dengan hash tersimpan (atau plaintext dari data lama)"""
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != PASSWORD_HASH_SCHEME:
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    _, iterations, salt, expected = parts
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode('utf-8'), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+def password_needs_rehash(stored):
+    """True untuk password plaintext atau hash dengan biaya berbeda dari konfigurasi"""
+    parts = stored.split("$")
+    return len(parts) != 4 or parts[0] != PASSWORD_HASH_SCHEME or int(parts[1]) != PASSWORD_HASH_ITERATIONS
+
+# ====================== FUNGSI AUTHENTIKASI ======================
+@profiled_page
+def login_page():
+    """Halaman login"""
+    st.title("🔐 Login Bakul Bawang")
+    
+    with st.form("login_form"):
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        
+        if st.form_submit_button("Login"):
+            if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+                st.session_state.logged_in = True
+                st.session_state.username = ADMIN_USERNAME
+                st.session_state.page = "products"
+                st.rerun()
+            
+            storage = get_storage()
+            user = storage.get_user(username)
+            if user and verify_password(password, user["password"]):
+                if password_needs_rehash(user["password"]):
+                    storage.update_user(username, {"password": hash_password(password)})
+                st.session_state.logged_in = True
+                st.session_state.username = username
+                st.session_state.page = "products"
+                st.rerun()
+            else:
+                st.error("Username/password salah")
+    
+    if st.button("Daftar Akun Baru"):
+        st.session_state.register_mode = True
+
+@profiled_page
+def register_page():
+    """Halaman pendaftaran"""
+    st.title("📝 Daftar Akun Baru")
+    
+    with st.form("register_form"):
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        confirm_pass = st.text_input("Konfirmasi Password", type="password")
+        
+        if st.form_submit_button("Daftar"):
+            if not username or not password:
+                st.error("Username dan password harus diisi")
+            elif password != confirm_pass:
+                st.error("Password tidak cocok")
+            else:
+                storage = get_storage()
+                if storage.get_user(username):
+                    st.error("Username sudah digunakan")
+                else:
+                    storage.add_user({"username": username, "password": hash_password(password)})
+                    st.success("Pendaftaran berhasil! Silakan login")
+                    st.session_state.register_mode = False
+    
+    if st.button("Kembali ke Login"):
+        st.session_state.register_mode = False
+
+# ====================== BLOB STORE GAMBAR ======================
+class BlobStore:
+    """Penyimpanan gambar berdasarkan hash isi (SHA-256) dengan penghitung referensi
+
+    Gambar yang sama hanya disimpan sekali meskipun diupload dengan nama
+    berbeda, dan file baru dihapus setelah tidak dipakai produk mana pun.
+    Jumlah referensi per path disimpan di refs_file.
+    """
+
+    def __init__(self, directory, refs_file):
+        self.directory = directory
+        self.refs_file = refs_file
+
+    def path_for(self, digest, extension):
+        return os.path.join(self.directory, digest[:2], digest + extension)
+
+    def owns(self, path):
+        """True jika path berada di blob store (gambar lama/default tidak dihitung)"""
+        return os.path.abspath(path).startswith(os.path.abspath(self.directory) + os.sep)
+
+    def _load_refs(self):
+        return load_from_json(self.refs_file, mutable=True) if os.path.exists(self.refs_file) else {}
+
+    def put(self, stream, extension):
+        """Simpan isi stream (dibaca per potongan) dan tambah satu referensi; kembalikan path blob"""
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(BLOB_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+                PROFILER.count_io(written=f.tell())
+
+            path = self.path_for(digest.hexdigest(), extension.lower())
+            with file_lock(self.refs_file):
+                if os.path.exists(path):
+                    os.remove(tmp_path)  # isi yang sama sudah tersimpan
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.chmod(tmp_path, 0o644)
+                    os.replace(tmp_path, path)
+                refs = self._load_refs()
+                refs[path] = refs.get(path, 0) + 1
+                save_to_json(self.refs_file, refs)
+            return path
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def release(self, path):
+        """Kurangi satu referensi; file dihapus jika referensinya habis"""
+        if not self.owns(path):
+            return
+        with file_lock(self.refs_file):
+            refs = self._load_refs()
+            count = refs.get(path, 0) - 1
+            if count > 0:
+                refs[path] = count
+            else:
+                refs.pop(path, None)
+                if os.path.exists(path):
+                    os.remove(path)
+            save_to_json(self.refs_file, refs)
+
+@st.cache_resource
+def get_blob_store():
+    return BlobStore(BLOB_DIR, BLOB_REFS_FILE)
+
+def store_uploaded_image(uploaded_file):
+    """Simpan gambar upload ke blob store, kembalikan path blob"""
+    extension = os.path.splitext(uploaded_file.name)[1] or ".jpg"
+    uploaded_file.seek(0)
+    return get_blob_store().put(uploaded_file, extension)
+
+# ====================== GAMBAR PRODUK ======================
+def create_thumbnail(image_path):
+    """Buat thumbnail (resize + re-encode WebP/JPEG) dengan nama sesuai hash isi gambar
+
+    Gambar yang isinya sama hanya diproses sekali.
+    """
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+        PROFILER.count_io(read=f.tell())
+
+    from PIL import Image, ImageOps, features
+
+    image_format = "WEBP" if features.check("webp") else "JPEG"
+    extension = "webp" if image_format == "WEBP" else "jpg"
+    thumb_path = os.path.join(
+        THUMBNAIL_DIR, f"{digest.hexdigest()[:32]}_{THUMBNAIL_SIZE[0]}.{extension}"
+    )
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    with Image.open(image_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(THUMBNAIL_SIZE)
+        if img.mode not in ("RGB", "RGBA") or image_format == "JPEG":
+            img = img.convert("RGB")
+
+        fd, tmp_path = tempfile.mkstemp(dir=THUMBNAIL_DIR, suffix="." + extension)
+        with os.fdopen(fd, 'wb') as f:
+            img.save(f, format=image_format, quality=THUMBNAIL_QUALITY)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+@st.cache_data(show_spinner=False)
+def cached_thumbnail(image_path, stat_key):
+    """Thumbnail untuk gambar yang belum punya thumbnail (dibuat sekali per versi file)"""
+    return create_thumbnail(image_path)
+
+def get_thumbnail(image_path):
+    """Path thumbnail untuk image_path, logo jika gambar tidak ada"""
+    if not os.path.exists(image_path):
+        image_path = LOGO_PATH
+    stat = os.stat(image_path)
+    return cached_thumbnail(image_path, (stat.st_mtime_ns, stat.st_size))
+
+@profiled
+def product_thumbnail(product):
+    """Thumbnail produk; dibuat dari gambar asli untuk produk lama yang belum punya"""
+    thumb_path = product.get("thumbnail")
+    if thumb_path and os.path.exists(thumb_path):
+        return thumb_path
+    return get_thumbnail(product.get("image", LOGO_PATH))
+
+# ====================== AGREGAT PENJUALAN ======================
+def empty_aggregates():
+    """Agregat kosong; watermark = transactions_version yang sudah tercakup"""
+    return {
+        "watermark": None,
+        "count": 0,
+        "status_counts": {},
+        "status_totals": {},
+        "product_quantities": {},
+        "daily_revenue": {}
+    }
+
+def transaction_day(date):
+    """Tanggal transaksi ("dd/mm/YYYY HH:MM") sebagai kunci YYYY-MM-DD"""
+    return f"{date[6:10]}-{date[3:5]}-{date[0:2]}"
+
+def apply_to_aggregates(aggregates, trans, sign=1):
+    """Tambahkan (sign=1) atau keluarkan (sign=-1) satu transaksi dari agregat
+
+    Pendapatan per hari dan jumlah per produk hanya menghitung transaksi completed.
+    """
+    status = trans.get("status", "pending")
+    aggregates["count"] += sign
+    counts = aggregates["status_counts"]
+    counts[status] = counts.get(status, 0) + sign
+    totals = aggregates["status_totals"]
+    totals[status] = totals.get(status, 0) + sign * trans["total"]
+
+    if status == "completed":
+        daily = aggregates["daily_revenue"]
+        day = transaction_day(trans["date"])
+        daily[day] = daily.get(day, 0) + sign * trans["total"]
+
+        quantities = aggregates["product_quantities"]
+        for item in trans["items"]:
+            key = str(item["id"])  # key JSON selalu string
+            quantities[key] = quantities.get(key, 0) + sign * item["quantity"]
+
+def rebuild_aggregates(attempts=3):
+    """Hitung ulang agregat dari seluruh riwayat transaksi
+
+    Watermark hanya diisi jika transactions_version sama sebelum dan sesudah
+    pemindaian, sehingga perubahan yang masuk di tengah pemindaian (dan
+    mungkin sudah ikut terhitung) tidak diterapkan dua kali oleh sesi yang
+    menulisnya. Jika terus berubah, watermark None: agregat dibangun ulang
+    saat dibaca berikutnya.
+    """
+    storage = get_storage()
+    for _ in range(attempts):
+        version = storage.transactions_version()
+        aggregates = empty_aggregates()
+        for chunk in storage.iter_transactions(EXPORT_CHUNK_SIZE):
+            for trans in chunk:
+                apply_to_aggregates(aggregates, trans)
+        if storage.transactions_version() == version:
+            aggregates["watermark"] = version
+            break
+    return aggregates
+
+def update_aggregates(changes, version, ops=1):
+    """Terapkan [(transaksi, sign)] ke agregat tersimpan untuk ops perubahan storage
+
+    version = transactions_version setelah perubahan. Perubahan hanya
+    diterapkan bila agregat tepat berada sebelum perubahan itu; jika tidak,
+    perubahan dilewati dan agregat dibangun ulang saat dibaca (watermark tidak cocok).
+    """
+    with file_lock(AGGREGATES_FILE):
+        if not os.path.exists(AGGREGATES_FILE):
+            return  # dibangun saat pertama kali dibaca
+        aggregates = load_from_json(AGGREGATES_FILE, mutable=True)
+        if not aggregates or aggregates["watermark"] is None:
+            return
+        if aggregates["watermark"] != version - ops:
+            return
+        for trans, sign in changes:
+            apply_to_aggregates(aggregates, trans, sign)
+        aggregates["watermark"] += ops
+        save_to_json(AGGREGATES_FILE, aggregates)
+
+def record_transaction(transaction, version):
+    """Perbarui agregat setelah checkout (version = transactions_version setelah transaksi ditulis)"""
+    update_aggregates([(transaction, 1)], version)
+
+def record_status_changes(previous, new_status, version):
+    """Perbarui agregat setelah status transaksi berubah
+
+    previous = transaksi sebelum diubah, version = transactions_version setelah perubahan.
+    """
+    changes = []
+    for trans in previous:
+        changes.append((trans, -1))
+        changes.append(({**trans, "status": new_status}, 1))
+    if changes:
+        update_aggregates(changes, version, ops=len(previous))
+
+def get_sales_aggregates():
+    """Agregat penjualan (read-only), dibangun ulang jika tidak cocok dengan data transaksi
+
+    Watermark yang berbeda dari transactions_version berarti ada perubahan
+    yang tidak tercatat (crash, proses lain, dsb). Setelah lock didapat file
+    dibaca ulang, jadi sesi yang menunggu sesi lain membangun ulang langsung
+    memakai hasilnya.
+    """
+    storage = get_storage()
+
+    def current():
+        aggregates = load_from_json(AGGREGATES_FILE) if os.path.exists(AGGREGATES_FILE) else None
+        if aggregates and aggregates["watermark"] == storage.transactions_version():
+            return aggregates
+        return None
+
+    aggregates = current()
+    if aggregates is None:
+        with file_lock(AGGREGATES_FILE):
+            aggregates = current()
+            if aggregates is None:
+                save_to_json(AGGREGATES_FILE, rebuild_aggregates())
+        aggregates = aggregates or load_from_json(AGGREGATES_FILE)
+    return aggregates
+
+# ====================== ANALITIK PENJUALAN ======================
+# Jumlah produk terlaris yang ditampilkan dan jumlah potongan transaksi (partisi
+# bulanan) yang DataFrame-nya disimpan di memori per proses
+TOP_PRODUCTS = 10
+SALES_FRAME_CACHE = 120
+
+def parse_transaction_dates(dates):
+    """List tanggal transaksi "dd/mm/YYYY HH:MM" -> array datetime64[m], diparse vectorized
+
+    Semua string berlebar tetap, jadi digit dibaca langsung dari buffer byte
+    tanpa strptime per baris.
+    """
+    import numpy as np
+
+    raw = np.array(dates, dtype="S16")
+    digits = np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(-1, 16).astype(np.int64) - ord("0")
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 3] * 10 + digits[:, 4]
+    year = digits[:, 6] * 1000 + digits[:, 7] * 100 + digits[:, 8] * 10 + digits[:, 9]
+    minutes = (digits[:, 11] * 10 + digits[:, 12]) * 60 + digits[:, 14] * 10 + digits[:, 15]
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    return months.astype("datetime64[D]").astype("datetime64[m]") + (day - 1) * 1440 + minutes
+
+def sales_frames(transactions):
+    """(orders, items) DataFrame dari list transaksi
+
+    orders: satu baris per transaksi (id, date, total); items: satu baris per
+    item (date, product_id, name, quantity, revenue).
+    """
+    import pandas as pd
+
+    order_ids, order_dates, order_totals, item_counts = [], [], [], []
+    product_ids, names, quantities, prices = [], [], [], []
+    for trans in transactions:
+        order_ids.append(trans["id"])
+        order_dates.append(trans["date"])
+        order_totals.append(trans["total"])
+        item_counts.append(len(trans["items"]))
+        for item in trans["items"]:
+            product_ids.append(item["id"])
+            names.append(item["name"])
+            quantities.append(item["quantity"])
+            prices.append(item["price"])
+
+    orders = pd.DataFrame({
+        "id": order_ids,
+        "date": pd.to_datetime(parse_transaction_dates(order_dates)),
+        "total": pd.Series(order_totals, dtype="int64")
+    })
+    items = pd.DataFrame({
+        # Tanggal item = tanggal pesanannya, diulang sesuai jumlah item (tanpa parsing ulang)
+        "date": orders["date"].repeat(item_counts).to_numpy(),
+        "product_id": pd.Series(product_ids, dtype="int64"),
+        "name": names,
+        "quantity": pd.Series(quantities, dtype="int64")
+    })
+    items["revenue"] = items["quantity"] * pd.Series(prices, dtype="int64")
+    return orders, items
+
+@st.cache_resource(show_spinner=False)
+def get_sales_frame_cache():
+    """Cache LRU kunci potongan transaksi -> (orders, items), dibagikan semua sesi"""
+    return {"lock": threading.Lock(), "frames": OrderedDict()}
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def build_sales_frames(version):
+    """(orders, items) DataFrame transaksi completed untuk satu transactions_version
+
+    Potongan yang tidak berubah (partisi bulanan) diambil dari cache, jadi
+    setiap versi baru hanya meratakan transaksi jurnal dan partisi yang
+    berubah. Semua agregasi setelahnya berjalan vectorized di pandas.
+    """
+    import pandas as pd
+
+    cache = get_sales_frame_cache()
+    parts = []
+    for key, load in get_storage().transaction_segments({"completed"}):
+        with cache["lock"]:
+            frames = cache["frames"].get(key) if key is not None else None
+            if frames is not None:
+                cache["frames"].move_to_end(key)
+        if frames is None:
+            frames = sales_frames(load())
+            if key is not None:
+                with cache["lock"]:
+                    cache["frames"][key] = frames
+                    while len(cache["frames"]) > SALES_FRAME_CACHE:
+                        cache["frames"].popitem(last=False)
+        parts.append(frames)
+    # Potongan kosong dilewati agar dtype kolom tetap sama dengan hasil penuh
+    parts = [frames for frames in parts if len(frames[0])] or parts[:1]
+    if len(parts) == 1:
+        return parts[0]
+    return (
+        pd.concat([orders for orders, _ in parts], ignore_index=True),
+        pd.concat([items for _, items in parts], ignore_index=True)
+    )
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def compute_sales_analytics(version):
+    """Ringkasan penjualan per hari, minggu dan produk untuk satu transactions_version"""
+    orders, items = build_sales_frames(version)
+    daily_orders = orders.set_index("date").resample("D")
+    daily_items = items.set_index("date").resample("D")
+    weekly_orders = orders.set_index("date").resample("W-MON", label="left", closed="left")
+    weekly_items = items.set_index("date").resample("W-MON", label="left", closed="left")
+
+    products = items.groupby("product_id").agg(
+        nama=("name", "last"),
+        jumlah_kg=("quantity", "sum"),
+        pendapatan=("revenue", "sum")
+    )
+    return {
+        "orders": len(orders),
+        "revenue": int(orders["total"].sum()),
+        "average_order": float(orders["total"].mean()) if len(orders) else 0.0,
+        "daily": daily_orders["total"].sum().to_frame("pendapatan").join(
+            daily_items["quantity"].sum().rename("jumlah_kg"), how="outer").fillna(0),
+        "weekly": weekly_orders["total"].sum().to_frame("pendapatan").join(
+            weekly_items["quantity"].sum().rename("jumlah_kg"), how="outer").fillna(0),
+        "top_products": products.sort_values("pendapatan", ascending=False).head(TOP_PRODUCTS)
+    }
+
+def get_sales_analytics():
+    """Analitik penjualan untuk data transaksi saat ini"""
+    return compute_sales_analytics(get_storage().transactions_version())
+
+# ====================== EKSPOR TRANSAKSI ======================
+# Satu baris per item transaksi; kolom transaksi diulang di setiap item
+EXPORT_COLUMNS = [
+    "id", "tanggal", "username", "status",
+    "nama_pelanggan", "telepon", "alamat",
+    "metode_pembayaran", "status_pembayaran",
+    "kurir", "ongkir", "estimasi",
+    "id_produk", "nama_produk", "harga", "jumlah", "subtotal", "total"
+]
+
+def flatten_transaction(trans):
+    """Baris ekspor (list nilai sesuai EXPORT_COLUMNS) untuk setiap item transaksi"""
+    customer = trans.get("customer", {})
+    payment = trans.get("payment", {})
+    shipping = trans.get("shipping", {})
+    head = [
+        trans["id"], trans["date"], trans["username"], trans.get("status", "pending"),
+        customer.get("name", ""), customer.get("phone", ""), customer.get("address", ""),
+        payment.get("method", ""), payment.get("status", ""),
+        shipping.get("method", ""), shipping.get("cost", 0), shipping.get("estimate", "")
+    ]
+    for item in trans["items"]:
+        yield head + [
+            item["id"], item["name"], item["price"], item["quantity"],
+            item["price"] * item["quantity"], trans["total"]
+        ]
+
+def iter_export_rows(start_date, end_date, statuses, chunk_size=EXPORT_CHUNK_SIZE):
+    """Baris ekspor transaksi dalam rentang tanggal (inklusif), dibaca per potongan
+
+    Storage hanya membaca bulan di dalam rentang; hari di tepi rentang
+    disaring di sini.
+    """
+    start, end = start_date.isoformat(), end_date.isoformat()
+    months = (start[:7], end[:7])
+    for chunk in get_storage().iter_transactions(chunk_size, statuses, months):
+        for trans in chunk:
+            if start <= transaction_day(trans["date"]) <= end:
+                yield from flatten_transaction(trans)
+
+def export_csv(rows):
+    """Isi file CSV (bytes, UTF-8 dengan BOM agar terbaca Excel) dari baris ekspor
+
+    Baris ditulis ke file sementara selama dibangun; hasil akhirnya tetap
+    dibaca utuh karena download_button butuh bytes.
+    """
+    with tempfile.TemporaryFile() as buffer:
+        text = io.TextIOWrapper(buffer, encoding='utf-8-sig', newline='')
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_COLUMNS)
+        writer.writerows(rows)
+        text.flush()
+        text.detach()
+        buffer.seek(0)
+        return buffer.read()
+
+def export_xlsx(rows):
+    """Isi file XLSX (bytes) dari baris ekspor, workbook mode write-only selama dibangun"""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Transaksi")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as buffer:
+        workbook.save(buffer)
+        buffer.seek(0)
+        return buffer.read()
+
+# ====================== ANTRIAN JOB ======================
+class JobQueue:
+    """Antrian job persisten berbasis file dengan worker thread pool, retry dan dead-letter
+
+    Setiap job adalah satu file JSON di pending/ bernama "<waktu jatuh tempo>-<id>.json",
+    sehingga urutan nama = urutan eksekusi. Worker mengklaim job dengan rename ke
+    processing/ (atomik, aman untuk beberapa proses). Job yang gagal dijadwalkan ulang
+    dengan jeda berlipat dua; setelah max_attempts kali gagal, job dipindah ke file
+    dead-letter (JSONL).
+    """
+
+    def __init__(self, directory, dead_letter_path, handlers, workers=JOB_WORKERS,
+                 max_attempts=JOB_MAX_ATTEMPTS, retry_delay=JOB_RETRY_DELAY):
+        self.pending_dir = os.path.abspath(os.path.join(directory, "pending"))
+        self.processing_dir = os.path.abspath(os.path.join(directory, "processing"))
+        self.dead_letter_path = os.path.abspath(dead_letter_path)
+        self.handlers = handlers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bakul-job")
+        self._wake = threading.Event()
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.processing_dir, exist_ok=True)
+
+    def enqueue(self, task, delay=0, **args):
+        """Tambahkan job task(**args) ke antrian, kembalikan id job"""
+        job = {"id": uuid.uuid4().hex, "task": task, "args": args, "attempts": 0}
+        self._put(job, time.time() + delay)
+        self._wake.set()
+        return job["id"]
+
+    def _put(self, job, due):
+        path = os.path.join(self.pending_dir, f"{int(due * 1000):015d}-{job['id']}.json")
+        atomic_write_json(path, job)
+
+    def start(self):
+        """Kembalikan job yang ditinggal proses mati ke pending lalu jalankan dispatcher"""
+        now = time.time()
+        for name in os.listdir(self.processing_dir):
+            path = os.path.join(self.processing_dir, name)
+            try:
+                if now - os.path.getmtime(path) > JOB_STALE_SECONDS:
+                    os.replace(path, os.path.join(self.pending_dir, name))
+            except FileNotFoundError:
+                pass
+        threading.Thread(target=self._dispatch, name="bakul-job-dispatcher", daemon=True).start()
+        return self
+
+    def pending_count(self):
+        return sum(1 for name in os.listdir(self.pending_dir) if name.endswith(".json"))
+
+    def _dispatch(self):
+        while True:
+            self._wake.wait(JOB_POLL_INTERVAL)
+            self._wake.clear()
+            try:
+                self._claim_due_jobs()
+            except OSError:
+                pass  # folder sementara tidak bisa dibaca, dicoba lagi di putaran berikutnya
+
+    def _claim_due_jobs(self):
+        now_ms = time.time() * 1000
+        for name in sorted(os.listdir(self.pending_dir)):
+            if not name.endswith(".json"):
+                continue
+            if int(name.split("-", 1)[0]) > now_ms:
+                break  # job berikutnya belum jatuh tempo
+            if not self._slots.acquire(blocking=False):
+                break  # semua worker sibuk
+            claimed = os.path.join(self.processing_dir, name)
+            try:
+                os.rename(os.path.join(self.pending_dir, name), claimed)
+            except FileNotFoundError:
+                self._slots.release()  # sudah diklaim proses lain
+                continue
+            os.utime(claimed)  # umur "processing" dihitung dari saat diklaim
+            self._executor.submit(self._run, claimed)
+
+    def _run(self, path):
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+            try:
+                job = json.loads(content)
+                handler = self.handlers[job["task"]]
+                job.setdefault("attempts", 0)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                # File job rusak atau task tidak dikenal tidak akan pernah berhasil,
+                # simpan isinya untuk diperiksa
+                self._dead_letter({
+                    "file": os.path.basename(path),
+                    "content": content.decode('utf-8', 'replace'),
+                    "last_error": f"{type(e).__name__}: {e}"
+                })
+                os.remove(path)
+                return
+            try:
+                handler(**job["args"])
+            except Exception as e:
+                job["attempts"] += 1
+                job["last_error"] = f"{type(e).__name__}: {e}"
+                if job["attempts"] >= self.max_attempts:
+                    self._dead_letter(job)
+                else:
+                    self._put(job, time.time() + self.retry_delay * 2 ** (job["attempts"] - 1))
+            os.remove(path)
+        finally:
+            self._slots.release()
+            self._wake.set()
+
+    def _dead_letter(self, job):
+        record = {**job, "failed_at": datetime.now().isoformat(timespec="seconds")}
+        with file_lock(self.dead_letter_path):
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+@st.cache_resource
+def get_job_queue():
+    """Antrian job proses ini (worker dijalankan sekali per proses)"""
+    return JobQueue(JOBS_DIR, JOBS_DEAD_LETTER, JOB_HANDLERS).start()
+
+def enqueue_job(task, **args):
+    """Jadwalkan task(**args) di background"""
+    return get_job_queue().enqueue(task, **args)
+
+def append_outbox(message):
+    """Tambahkan satu pesan ke WHATSAPP_OUTBOX"""
+    record = {"to": WHATSAPP_NUMBER, "text": message, "created": datetime.now().isoformat(timespec="seconds")}
+    with file_lock(WHATSAPP_OUTBOX):
+        with open(WHATSAPP_OUTBOX, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def prepare_order_message(transaction):
+    """Job: siapkan pesan WhatsApp pesanan baru untuk admin"""
+    items = ", ".join(f"{item['name']} {item['quantity']} kg" for item in transaction["items"])
+    append_outbox(
+        f"Pesanan baru #{transaction['id']} dari {transaction['customer']['name']} "
+        f"({transaction['customer']['phone']}): {items}. Total Rp{transaction['total']:,} "
+        f"via {transaction['payment']['method']}, kirim {transaction['shipping']['method']}."
+    )
+
+def evaluate_stock_alerts(product_ids):
+    """Job: kirim peringatan ke admin untuk produk yang stoknya baru melewati batas
+
+    Pemanggil hanya menjadwalkan produk yang baru masuk status menipis (lihat
+    crossed_low_stock), sehingga admin tidak menerima peringatan yang sama
+    di setiap checkout. Produk yang sudah diisi ulang saat job berjalan dilewati.
+    """
+    by_id = get_catalog_index().by_id
+    for product_id in product_ids:
+        product = by_id.get(product_id)
+        if product and is_low_stock(product):
+            append_outbox(f"Stok {product['name']} tinggal {product['stock']} kg")
+
+def process_order(transaction, low_stock_ids=()):
+    """Job: pekerjaan lanjutan satu checkout (pesan admin dan peringatan stok)"""
+    prepare_order_message(transaction)
+    if low_stock_ids:
+        evaluate_stock_alerts(low_stock_ids)
+
+def compact_transactions():
+    """Job: padatkan jurnal transaksi ke arsip partisi bulanan"""
+    get_transaction_log().compact()
+
+def process_product_image(product_id, image_path):
+    """Job: buat thumbnail gambar produk lalu simpan path-nya di data produk"""
+    thumb_path = create_thumbnail(image_path)
+    product = next((p for p in get_storage().load_products() if p["id"] == product_id), None)
+    if product and product.get("image") == image_path:
+        get_storage().update_product(product_id, {"thumbnail": thumb_path})
+
+# Nama task -> fungsi; argumen job harus bisa diserialisasi JSON.
+# record_transaction dan prepare_order_message dipertahankan untuk job lama di antrian
+JOB_HANDLERS = {
+    "process_order": process_order,
+    "record_transaction": record_transaction,
+    "prepare_order_message": prepare_order_message,
+    "evaluate_stock_alerts": evaluate_stock_alerts,
+    "process_product_image": process_product_image,
+    "compact_transactions": compact_transactions
+}
+
+# ====================== INDEX KATALOG ======================
+# Label tab katalog -> kategori produk (None = semua produk)
+CATALOG_TABS = {"Semua Produk": None, "Bawang": "bawang", "Bibit": "bibit"}
+
+def stock_threshold(product):
+    """Batas stok menipis untuk produk (per produk, default LOW_STOCK_THRESHOLD)"""
+    return product.get("low_stock_threshold", LOW_STOCK_THRESHOLD)
+
+def is_low_stock(product):
+    return product["stock"] < stock_threshold(product)
+
+def crossed_low_stock(before, after):
+    """True jika produk baru masuk status stok menipis (before = data produk sebelum diubah)"""
+    return not is_low_stock(before) and is_low_stock(after)
+
+def low_stock_key(product):
+    """Urutan low_stock: paling kritis (stok terkecil dibanding batasnya) di depan"""
+    return (product["stock"] - stock_threshold(product), product["stock"], product["id"])
+
+class CatalogIndex:
+    """Index produk per kategori, dibangun sekali per versi katalog
+
+    Setiap checkout dan perubahan stok oleh admin menaikkan versi katalog,
+    sehingga low_stock selalu mengikuti stok terbaru. Jika previous punya
+    urutan id dan kategori yang sama (checkout, ubah stok/harga), hanya
+    produk yang berubah yang diganti; low_stock tidak diurutkan ulang.
+    """
+
+    def __init__(self, products, previous=None):
+        products = tuple(products)
+        changed = self._changes(products, previous) if previous is not None else None
+        if changed is not None:
+            self._update(previous, changed)
+            return
+        self.all = products
+        by_category = {}
+        for product in self.all:
+            by_category.setdefault(product["category"], []).append(product)
+        self.by_category = {category: tuple(items) for category, items in by_category.items()}
+        self.by_id = {product["id"]: product for product in self.all}
+        self.low_stock = tuple(sorted(filter(is_low_stock, self.all), key=low_stock_key))
+
+    @staticmethod
+    def _changes(products, previous):
+        """{product_id: produk baru} yang berubah, None jika urutan id/kategori berbeda"""
+        if len(products) != len(previous.all):
+            return None
+        changed = {}
+        for new, old in zip(products, previous.all):
+            if new != old:
+                if new["id"] != old["id"] or new["category"] != old["category"]:
+                    return None
+                changed[new["id"]] = new
+        return changed
 
-ADMIN_USERNAME = "admin"
-ADMIN_PASSWORD = "admin123"
-WHATSAPP_NUMBER = "6281234567890"
+    def _update(self, previous, changed):
+        # Produk yang tidak berubah tetap objek lama, jadi cache turunan (mis. SearchIndex) tetap cocok
+        self.all = tuple(changed.get(product["id"], product) for product in previous.all)
+        categories = {product["category"] for product in changed.values()}
+        self.by_category = {
+            category: tuple(changed.get(product["id"], product) for product in items)
+            if category in categories else items
+            for category, items in previous.by_category.items()
+        }
+        self.by_id = {**previous.by_id, **changed}
+        low_stock = [product for product in previous.low_stock if product["id"] not in changed]
+        for product in changed.values():
+            if is_low_stock(product):
+                bisect.insort(low_stock, product, key=low_stock_key)
+        self.low_stock = tuple(low_stock)
 
-# ====================== FUNGSI UTILITAS ======================
-def setup_files():
-    """Inisialisasi file dan folder"""
-    os.makedirs("data", exist_ok=True)
-    os.makedirs("assets", exist_ok=True)
-    os.makedirs(PRODUCT_IMAGE_DIR, exist_ok=True)
-    
-    # Buat logo default jika tidak ada
-    if not os.path.exists(LOGO_PATH):
-        img = Image.new('RGB', (200, 100), color='#FFA500')
-        img.save(LOGO_PATH)
-    
-    # Inisialisasi produk contoh
-    if not os.path.exists(PRODUCTS_FILE):
-        sample_products = [
-            {
-                "id": 1,
-                "name": "Bawang Merah",
-                "price": 37905,
-                "stock": 100,
-                "description": "Bawang merah segar kualitas premium",
-                "category": "bawang",
-                "image": os.path.join(PRODUCT_IMAGE_DIR, "bawang_merah.jpg")
-            },
-            {
-                "id": 2,
-                "name": "Bibit Bawang Merah",
-                "price": 49999,
-                "stock": 50,
-                "description": "Bibit unggul siap tanam",
-                "category": "bibit",
-                "image": os.path.join(PRODUCT_IMAGE_DIR, "bibit_bawang.jpg")
-            }
-        ]
-        save_to_json(PRODUCTS_FILE, sample_products)
-        
-        # Buat gambar contoh
-        for product in sample_products:
-            if not os.path.exists(product["image"]):
-                color = '#FF6347' if product["category"] == "bawang" else '#32CD32'
-                img = Image.new('RGB', (400, 300), color=color)
-                img.save(product["image"])
+    def products(self, category=None):
+        return self.all if category is None else self.by_category.get(category, ())
 
-    # Inisialisasi file lainnya
-    if not os.path.exists(TRANSACTIONS_FILE):
-        save_to_json(TRANSACTIONS_FILE, [])
-    if not os.path.exists(USERS_FILE):
-        save_to_json(USERS_FILE, [])
+@st.cache_resource
+def get_catalog_index_state():
+    """CatalogIndex terakhir yang dibangun proses ini (dasar pembaruan berikutnya)"""
+    return {"index": None}
 
-def load_from_json(file_path):
-    """Memuat data dari file JSON dengan error handling"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            if content.endswith(','):
-                content = content[:-1]
-            return json.loads(content) if content else []
-    except Exception as e:
-        st.error(f"Gagal memuat file {file_path}: {str(e)}")
-        return []
+@st.cache_resource(max_entries=2, show_spinner=False)
+def build_catalog_index(version):
+    """CatalogIndex untuk satu versi katalog (dibagikan antar sesi)"""
+    state = get_catalog_index_state()
+    index = CatalogIndex(get_storage().load_products(), previous=state["index"])
+    state["index"] = index
+    return index
 
-def save_to_json(file_path, data):
-    """Menyimpan data ke file JSON"""
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        st.error(f"Gagal menyimpan ke {file_path}: {str(e)}")
+def get_catalog_index():
+    """CatalogIndex untuk versi katalog saat ini"""
+    return build_catalog_index(get_storage().catalog_version())
 
-# ====================== FUNGSI AUTHENTIKASI ======================
-def login_page():
-    """Halaman login"""
-    st.title("🔐 Login Bakul Bawang")
-    
-    with st.form("login_form"):
-        username = st.text_input("Username")
-        password = st.text_input("Password", type="password")
-        
-        if st.form_submit_button("Login"):
-            if username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
-                st.session_state.logged_in = True
-                st.session_state.username = ADMIN_USERNAME
-                st.session_state.page = "products"
-                st.rerun()
-            
-            users = load_from_json(USERS_FILE)
-            user = next((u for u in users if u["username"] == username and u["password"] == password), None)
-            if user:
-                st.session_state.logged_in = True
-                st.session_state.username = username
-                st.session_state.page = "products"
-                st.rerun()
-            else:
-                st.error("Username/password salah")
-    
-    if st.button("Daftar Akun Baru"):
-        st.session_state.register_mode = True
+# ====================== PENCARIAN PRODUK ======================
+# Kata umum yang tidak diindex
+SEARCH_STOPWORDS = frozenset([
+    "dan", "yang", "di", "ke", "dari", "untuk", "dengan", "atau", "ini", "itu", "per"
+])
+# Partikel/akhiran yang dilepas dari kata panjang: "bawangnya" -> "bawang"
+SEARCH_SUFFIXES = ("nya", "lah", "kah", "pun")
 
-def register_page():
-    """Halaman pendaftaran"""
-    st.title("📝 Daftar Akun Baru")
-    
-    with st.form("register_form"):
-        username = st.text_input("Username")
-        password = st.text_input("Password", type="password")
-        confirm_pass = st.text_input("Konfirmasi Password", type="password")
-        
-        if st.form_submit_button("Daftar"):
-            if not username or not password:
-                st.error("Username dan password harus diisi")
-            elif password != confirm_pass:
-                st.error("Password tidak cocok")
-            else:
-                users = load_from_json(USERS_FILE)
-                if any(u["username"] == username for u in users):
-                    st.error("Username sudah digunakan")
-                else:
-                    users.append({"username": username, "password": password})
-                    save_to_json(USERS_FILE, users)
-                    st.success("Pendaftaran berhasil! Silakan login")
-                    st.session_state.register_mode = False
-    
-    if st.button("Kembali ke Login"):
-        st.session_state.register_mode = False
+def tokenize(text, stopwords=SEARCH_STOPWORDS):
+    """Pecah teks menjadi kata pencarian: huruf kecil, tanpa aksen, tanpa stopword
+
+    Kata ulang dengan tanda hubung ("sayur-sayuran") dipecah per bagian.
+    """
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        for suffix in SEARCH_SUFFIXES:
+            if len(word) > len(suffix) + 3 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        if word not in stopwords:
+            tokens.append(word)
+    return tokens
+
+def query_terms(query):
+    """Kata query; stopword dibuang kecuali kata terakhir, yang bisa jadi
+    awalan kata yang sedang diketik ("ke" -> "kentang", "di" -> "dijual")"""
+    terms = tokenize(query, stopwords=())
+    return [term for term in terms[:-1] if term not in SEARCH_STOPWORDS] + terms[-1:]
+
+class SearchIndex:
+    """Inverted index nama, deskripsi dan kategori produk dengan pencarian awalan kata
+
+    sync() hanya men-tokenisasi ulang produk yang teksnya berubah, ditambah,
+    atau dihapus sejak versi katalog sebelumnya; perubahan stok/harga saja
+    tidak menyentuh index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog = None  # CatalogIndex terakhir yang disinkronkan
+        self._docs = {}  # product_id -> (teks sumber, kata di nama, semua kata)
+        self._postings = {}  # kata -> set product_id
+        self._name_postings = {}  # kata -> set product_id yang namanya memuat kata itu
+        self._vocabulary = []  # semua kata, terurut (untuk pencarian awalan)
+        self._vocabulary_changes = 0
+
+    @staticmethod
+    def _source(product):
+        return (product["name"], product.get("description", ""), product["category"])
+
+    def _add(self, product_id, source):
+        name_tokens = frozenset(tokenize(source[0]))
+        tokens = name_tokens | frozenset(tokenize(" ".join(source[1:])))
+        self._docs[product_id] = (source, name_tokens, tokens)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = set()
+                self._vocabulary_changes += 1
+                if self._vocabulary_changes <= 64:
+                    bisect.insort(self._vocabulary, token)
+            postings.add(product_id)
+        for token in name_tokens:
+            self._name_postings.setdefault(token, set()).add(product_id)
+
+    def _remove(self, product_id):
+        _, name_tokens, tokens = self._docs.pop(product_id)
+        for token in tokens:
+            postings = self._postings[token]
+            postings.discard(product_id)
+            if not postings:
+                del self._postings[token]
+                self._vocabulary_changes += 1
+                if self._vocabulary_changes <= 64:
+                    del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+        for token in name_tokens:
+            postings = self._name_postings[token]
+            postings.discard(product_id)
+            if not postings:
+                del self._name_postings[token]
+
+    def sync(self, catalog):
+        """Samakan index dengan CatalogIndex (tidak melakukan apa-apa jika katalog sama)"""
+        with self._lock:
+            if catalog is self._catalog:
+                return
+            for product_id in [pid for pid in self._docs if pid not in catalog.by_id]:
+                self._remove(product_id)
+            for product in catalog.all:
+                source = self._source(product)
+                doc = self._docs.get(product["id"])
+                if doc is not None and doc[0] == source:
+                    continue
+                if doc is not None:
+                    self._remove(product["id"])
+                self._add(product["id"], source)
+            # Perubahan kecil disisipkan satu per satu, perubahan besar diurutkan ulang sekaligus
+            if self._vocabulary_changes > 64:
+                self._vocabulary = sorted(self._postings)
+            self._vocabulary_changes = 0
+            self._catalog = catalog
+
+    def _expand(self, prefix):
+        """Semua kata di index yang diawali prefix"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff", start)
+        return self._vocabulary[start:end]
+
+    def search(self, query):
+        """product_id yang cocok dengan semua kata query (awalan), skor tertinggi dulu
+
+        Kata yang cocok di nama bernilai 2, di deskripsi/kategori bernilai 1.
+        None jika query tidak berisi kata pencarian (tampilkan semua produk).
+        """
+        terms = query_terms(query)
+        with self._lock:
+            matches = None
+            name_hits = []
+            for term in terms:
+                words = self._expand(term)
+                found = set().union(*(self._postings[word] for word in words))
+                found = found if matches is None else matches & found
+                if not found and term in SEARCH_STOPWORDS:
+                    continue  # stopword di akhir query yang bukan awalan kata apa pun
+                matches = found
+                if not matches:
+                    return []
+                name_hits.append(set().union(*(self._name_postings.get(word, ()) for word in words)))
+            if matches is None:
+                return None
+
+            # Kelompokkan per jumlah kata yang cocok di nama (operasi set, tanpa loop per produk)
+            by_score = {0: matches}
+            for hits in name_hits:
+                promoted = {}
+                for score, ids in by_score.items():
+                    inside = ids & hits
+                    if inside:
+                        promoted[score + 1] = promoted.get(score + 1, set()) | inside
+                    rest = ids - inside
+                    if rest:
+                        promoted[score] = promoted.get(score, set()) | rest
+                by_score = promoted
+        result = []
+        for score in sorted(by_score, reverse=True):
+            result.extend(sorted(by_score[score]))
+        return result
+
+@st.cache_resource
+def get_search_index():
+    """SearchIndex bersama untuk proses ini"""
+    return SearchIndex()
+
+def search_products(query, catalog, category=None):
+    """Produk katalog yang cocok dengan query, dibatasi kategori jika diberikan
+
+    None jika query tidak berisi kata pencarian.
+    """
+    index = get_search_index()
+    index.sync(catalog)
+    product_ids = index.search(query)
+    if product_ids is None:
+        return None
+    products = (catalog.by_id[product_id] for product_id in product_ids)
+    return tuple(p for p in products if category is None or p["category"] == category)
 
 # ====================== FUNGSI PRODUK ======================
+@profiled
 def display_product_card(product, index):
     """Menampilkan kartu produk dengan key unik"""
     with st.container():
         col_img, col_info = st.columns([1, 2])
         
         with col_img:
-            img_path = product.get("image", LOGO_PATH)
             try:
-                image_obj = Image.open(img_path) if os.path.exists(img_path) else Image.open(LOGO_PATH)
-                st.image(image_obj, width=150, use_container_width=True)   
+                st.image(product_thumbnail(product), width=150, use_container_width=True)
             except:
-                st.image(Image.open(LOGO_PATH), width=150, use_container_width=True)
+                st.image(LOGO_PATH, width=150, use_container_width=True)
         
         with col_info:
             st.subheader(product["name"])
             st.write(f"**Harga:** Rp{product['price']:,}/kg")
             
-            if product["stock"] < 10:
+            if is_low_stock(product):
                 st.error(f"🛑 Stok: {product['stock']} kg (Hampir Habis!)")
             else:
                 st.success(f"✅ Stok: {product['stock']} kg")
@@ -181,114 +3432,283 @@ def display_product_card(product, index):
                 add_to_cart(product, quantity)
                 st.success(f"Ditambahkan {quantity} kg {product['name']}")
 
+@profiled_page
 def show_products():
     """Tampilkan daftar produk"""
     st.header("🛍️ Daftar Produk")
-    
-    products = load_from_json(PRODUCTS_FILE)
-    if not products:
+
+    catalog = get_catalog_index()
+    if not catalog.all:
         st.warning("Tidak ada produk")
         return
-    
-    tab1, tab2, tab3 = st.tabs(["Semua Produk", "Bawang", "Bibit"])
-    
-    with tab1:
-        for index, product in enumerate(products):
-            display_product_card(product, index)
-            st.divider()
-    
-    with tab2:
-        bawang_products = [p for p in products if p["category"] == "bawang"]
-        if not bawang_products:
-            st.warning("Tidak ada produk bawang")
-        for index, product in enumerate(bawang_products):
-            display_product_card(product, index)
-            st.divider()
-    
-    with tab3:
-        bibit_products = [p for p in products if p["category"] == "bibit"]
-        if not bibit_products:
-            st.warning("Tidak ada produk bibit")
-        for index, product in enumerate(bibit_products):
-            display_product_card(product, index)
-            st.divider()
+
+    query = st.text_input(
+        "Cari produk",
+        key="catalog_search",
+        placeholder="🔍 Cari produk (mis. bawang merah, bibit)",
+        label_visibility="collapsed"
+    ).strip()
+
+    # Hanya tab aktif yang dirender (st.tabs selalu merender semua tab)
+    tab = st.radio(
+        "Kategori",
+        list(CATALOG_TABS),
+        horizontal=True,
+        key="catalog_tab",
+        label_visibility="collapsed"
+    )
+    category = CATALOG_TABS[tab]
+    products = search_products(query, catalog, category) if query else None
+    searching = products is not None
+    if searching:
+        if not products:
+            st.warning(f"Tidak ada produk yang cocok dengan \"{query}\"")
+            return
+        st.caption(f"{len(products)} produk ditemukan")
+    else:
+        products = catalog.products(category)
+        if not products:
+            st.warning(f"Tidak ada produk {category}")
+            return
+
+    page_count = (len(products) + PRODUCTS_PAGE_SIZE - 1) // PRODUCTS_PAGE_SIZE
+    page_key = f"catalog_page_{tab}_search" if searching else f"catalog_page_{tab}"
+    page = min(st.session_state.get(page_key, 1), page_count)
+    start = (page - 1) * PRODUCTS_PAGE_SIZE
+
+    for index, product in enumerate(products[start:start + PRODUCTS_PAGE_SIZE], start=start):
+        display_product_card(product, index)
+        st.divider()
+
+    show_pagination(page_key, page, page_count)
+
+def show_pagination(page_key, page, page_count):
+    """Navigasi halaman sebelumnya/berikutnya, nomor halaman disimpan di session_state[page_key]"""
+    if page_count <= 1:
+        return
+
+    cols = st.columns([1, 2, 1])
+    with cols[0]:
+        if st.button("⬅️ Sebelumnya", key=f"{page_key}_prev", disabled=page <= 1):
+            st.session_state[page_key] = page - 1
+            st.rerun()
+    with cols[1]:
+        st.caption(f"Halaman {page} dari {page_count}")
+    with cols[2]:
+        if st.button("Berikutnya ➡️", key=f"{page_key}_next", disabled=page >= page_count):
+            st.session_state[page_key] = page + 1
+            st.rerun()
+
+# ====================== PERHITUNGAN HARGA ======================
+class CartQuote:
+    """Rincian harga keranjang (read-only, dibagikan antar sesi lewat cache)
+
+    lines berisi (product_id, produk atau None jika sudah dihapus, jumlah, subtotal).
+    """
+    __slots__ = ("lines", "missing", "subtotal", "shipping", "payment", "shipping_cost", "payment_fee", "total")
+
+    def __init__(self, lines, shipping=None, payment=None):
+        self.lines = lines
+        self.missing = tuple(product_id for product_id, product, _, _ in lines if product is None)
+        self.subtotal = sum(subtotal for _, _, _, subtotal in lines)
+        self.shipping = SHIPPING_METHODS[shipping] if shipping else None
+        self.payment = PAYMENT_METHODS[payment] if payment else None
+        self.shipping_cost = self.shipping["cost"] if self.shipping else 0
+        self.payment_fee = self.payment["fee"] if self.payment else 0
+        self.total = self.subtotal + self.shipping_cost + self.payment_fee
+
+@st.cache_resource(max_entries=1000, show_spinner=False)
+def price_cart(items, catalog_version, shipping=None, payment=None):
+    """CartQuote untuk items ((product_id, jumlah), ...) pada satu versi katalog"""
+    by_id = build_catalog_index(catalog_version).by_id
+    lines = []
+    for product_id, quantity in items:
+        product = by_id.get(product_id)
+        lines.append((product_id, product, quantity, product["price"] * quantity if product else 0))
+    return CartQuote(tuple(lines), shipping, payment)
+
+def quote_cart(cart, shipping=None, payment=None):
+    """Harga keranjang saat ini; dihitung sekali per isi keranjang + versi katalog"""
+    return price_cart(tuple(cart.items.items()), get_storage().catalog_version(), shipping, payment)
+
+def format_rupiah(amount):
+    """Format rupiah dengan titik pemisah ribuan, mis. Rp15.000"""
+    return f"Rp{amount:,}".replace(",", ".")
 
 # ====================== FUNGSI KERANJANG ======================
+class Cart:
+    """Keranjang ringkas: {product_id: jumlah}, data produk diambil dari katalog saat dirender
+
+    prices menyimpan harga yang dilihat user saat produk ditambahkan, untuk
+    menandai baris yang harganya berubah sebelum checkout.
+    """
+    __slots__ = ("owner", "items", "prices")
+
+    def __init__(self, owner, items=None, prices=None):
+        self.owner = owner
+        self.items = dict(items or {})
+        self.prices = dict(prices or {})
+
+    def __len__(self):
+        return len(self.items)
+
+    def save(self):
+        get_storage().save_cart(self.owner, self.items, self.prices)
+
+def cart_rows(items, prices):
+    """Format simpan keranjang: [[id, jumlah, harga]] agar id tetap int dan urutan terjaga"""
+    return [[product_id, quantity, prices.get(product_id)] for product_id, quantity in items.items()]
+
+def cart_from_rows(rows):
+    """Kebalikan cart_rows; baris lama [id, jumlah] belum punya harga"""
+    items = {}
+    prices = {}
+    for product_id, quantity, *price in rows:
+        items[product_id] = quantity
+        if price and price[0] is not None:
+            prices[product_id] = price[0]
+    return items, prices
+
+def get_cart():
+    """Keranjang user yang sedang login, dimuat dari penyimpanan sekali per sesi"""
+    cart = st.session_state.get("cart")
+    if not isinstance(cart, Cart) or cart.owner != st.session_state.username:
+        cart = Cart(st.session_state.username, *get_storage().load_cart(st.session_state.username))
+        st.session_state.cart = cart
+    return cart
+
+def cart_changes(cart, quote):
+    """Baris keranjang yang berubah sejak ditambahkan: {product_id: [pesan]}
+
+    quote sudah di-cache per versi katalog, jadi pemeriksaan ini tidak
+    membaca ulang katalog. Baris tanpa harga tersimpan (keranjang lama)
+    memakai harga saat ini.
+    """
+    changes = {}
+    for product_id, product, quantity, _ in quote.lines:
+        if product is None:
+            continue
+        seen = cart.prices.setdefault(product_id, product["price"])
+        messages = []
+        if seen != product["price"]:
+            messages.append(f"Harga berubah dari {format_rupiah(seen)} menjadi {format_rupiah(product['price'])}/kg")
+        if product["stock"] < quantity:
+            messages.append(f"Stok tinggal {product['stock']} kg" if product["stock"] else "Stok habis")
+        if messages:
+            changes[product_id] = messages
+    return changes
+
+def accept_cart_changes(cart, quote):
+    """Pakai harga terbaru dan sesuaikan jumlah dengan stok; produk yang habis dihapus"""
+    for product_id, product, quantity, _ in quote.lines:
+        if product is None:
+            continue
+        cart.prices[product_id] = product["price"]
+        if product["stock"] <= 0:
+            del cart.items[product_id]
+            cart.prices.pop(product_id, None)
+        elif product["stock"] < quantity:
+            cart.items[product_id] = product["stock"]
+    cart.save()
+
 def add_to_cart(product, quantity):
     """Tambahkan produk ke keranjang"""
-    if 'cart' not in st.session_state:
-        st.session_state.cart = []
-    
-    for item in st.session_state.cart:
-        if item["product"]["id"] == product["id"]:
-            new_quantity = item["quantity"] + quantity
-            if new_quantity > product["stock"]:
-                st.error("Stok tidak cukup!")
-                return
-            item["quantity"] = new_quantity
-            st.success(f"Jumlah {product['name']} ditambah {quantity} kg")
+    cart = get_cart()
+    
+    if product["id"] in cart.items:
+        new_quantity = cart.items[product["id"]] + quantity
+        if new_quantity > product["stock"]:
+            st.error("Stok tidak cukup!")
             return
+        cart.items[product["id"]] = new_quantity
+        cart.prices[product["id"]] = product["price"]
+        cart.save()
+        st.success(f"Jumlah {product['name']} ditambah {quantity} kg")
+        return
     
-    st.session_state.cart.append({
-        "product": product,
-        "quantity": quantity
-    })
+    cart.items[product["id"]] = quantity
+    cart.prices[product["id"]] = product["price"]
+    cart.save()
 
+@profiled_page
 def show_cart():
     """Tampilkan keranjang belanja"""
     st.header("🛒 Keranjang Belanja")
     
-    if 'cart' not in st.session_state or not st.session_state.cart:
+    cart = get_cart()
+    if not cart:
         st.warning("Keranjang kosong")
         return
     
-    total = 0
-    for i, item in enumerate(st.session_state.cart):
-        product = item["product"]
-        subtotal = product["price"] * item["quantity"]
-        total += subtotal
-        
+    quote = quote_cart(cart)
+    changes = cart_changes(cart, quote)
+    for product_id, product, quantity, subtotal in quote.lines:
         with st.container():
             cols = st.columns([3, 2, 1, 1])
             with cols[0]:
-                st.write(f"**{product['name']}**")
-                st.write(f"Rp{product['price']:,}/kg")
+                if product:
+                    st.write(f"**{product['name']}**")
+                    st.write(f"Rp{product['price']:,}/kg")
+                else:
+                    st.write("**Produk tidak tersedia lagi**")
             
             with cols[1]:
-                new_quantity = st.number_input(
-                    "Jumlah (kg)",
-                    min_value=1,
-                    max_value=product["stock"],
-                    value=item["quantity"],
-                    key=f"edit_qty_{i}"
-                )
-                
-                if new_quantity != item["quantity"]:
-                    if st.button("Update", key=f"update_{i}"):
-                        item["quantity"] = new_quantity
-                        st.rerun()
+                if product and product["stock"] > 0:
+                    new_quantity = st.number_input(
+                        "Jumlah (kg)",
+                        min_value=1,
+                        max_value=product["stock"],
+                        value=min(quantity, product["stock"]),
+                        key=f"edit_qty_{product_id}"
+                    )
+                    
+                    if new_quantity != quantity:
+                        if st.button("Update", key=f"update_{product_id}"):
+                            cart.items[product_id] = new_quantity
+                            cart.save()
+                            st.rerun()
+                elif product:
+                    st.warning("Stok habis")
+                for message in changes.get(product_id, ()):
+                    st.warning(f"⚠️ {message}")
             
             with cols[2]:
                 st.write(f"Subtotal: Rp{subtotal:,}")
             
             with cols[3]:
-                if st.button("❌", key=f"del_{i}"):
-                    st.session_state.cart.pop(i)
+                if st.button("❌", key=f"del_{product_id}"):
+                    del cart.items[product_id]
+                    cart.prices.pop(product_id, None)
+                    cart.save()
                     st.rerun()
             
             st.divider()
     
-    st.subheader(f"Total: Rp{total:,}")
+    st.subheader(f"Total: Rp{quote.subtotal:,}")
+
+    if changes:
+        st.warning("Beberapa produk berubah sejak ditambahkan ke keranjang, periksa sebelum checkout")
+        if st.button("✔️ Terima Perubahan"):
+            accept_cart_changes(cart, quote)
+            st.rerun()
     
-    if st.button("🚀 Lanjut ke Checkout", type="primary"):
+    if st.button("🚀 Lanjut ke Checkout", type="primary", disabled=bool(changes or quote.missing)):
         st.session_state.checkout_active = True
 
 # ====================== FUNGSI CHECKOUT ======================
+@profiled_page
 def show_checkout():
     """Tampilkan form checkout"""
     st.header("💳 Checkout")
     
-    total = sum(item["product"]["price"] * item["quantity"] for item in st.session_state.cart)
+    cart = get_cart()
+    if cart_changes(cart, quote_cart(cart)):
+        # Katalog berubah setelah user meninggalkan halaman keranjang
+        st.warning("Harga atau stok produk di keranjang berubah, periksa keranjang terlebih dahulu")
+        if st.button("🛒 Kembali ke Keranjang"):
+            st.session_state.checkout_active = False
+            st.rerun()
+        return
     
     with st.form("checkout_form"):
         st.subheader("Informasi Pengiriman")
@@ -299,28 +3719,33 @@ def show_checkout():
         st.subheader("Metode Pengiriman")
         shipping_method = st.selectbox(
             "Pilihan Pengiriman",
-            ["JNE Reguler (Rp15.000)", "J&T Express (Rp12.000)", "SiCepat (Rp10.000)"]
+            list(SHIPPING_METHODS),
+            format_func=lambda key: f"{SHIPPING_METHODS[key]['label']} ({format_rupiah(SHIPPING_METHODS[key]['cost'])})"
         )
         
-        shipping_cost = 15000 if "JNE" in shipping_method else 12000 if "J&T" in shipping_method else 10000
-        grand_total = total + shipping_cost
-        
         st.subheader("Metode Pembayaran")
         payment_method = st.selectbox(
             "Pembayaran",
-            ["Transfer BRI", "Transfer BCA", "Transfer SeaBank", "COD (Bayar di Tempat)"]
+            list(PAYMENT_METHODS),
+            format_func=lambda key: PAYMENT_METHODS[key]["label"]
         )
         
+        quote = quote_cart(cart, shipping_method, payment_method)
+        
         st.subheader("Ringkasan Pembayaran")
         col1, col2 = st.columns(2)
         with col1:
             st.write("Subtotal:")
             st.write("Ongkos Kirim:")
+            if quote.payment_fee:
+                st.write("Biaya Pembayaran:")
             st.write("**Total:**")
         with col2:
-            st.write(f"Rp{total:,}")
-            st.write(f"Rp{shipping_cost:,}")
-            st.write(f"**Rp{grand_total:,}**")
+            st.write(f"Rp{quote.subtotal:,}")
+            st.write(f"Rp{quote.shipping_cost:,}")
+            if quote.payment_fee:
+                st.write(f"Rp{quote.payment_fee:,}")
+            st.write(f"**Rp{quote.total:,}**")
         
         st.divider()
         
@@ -328,58 +3753,79 @@ def show_checkout():
             if not name or not phone or not address.strip():
                 st.error("Harap lengkapi semua informasi pengiriman!")
             else:
-                process_checkout(
-                    name, phone, address,
-                    shipping_method, payment_method,
-                    grand_total, shipping_cost
-                )
+                process_checkout(name, phone, address, shipping_method, payment_method)
+
+def process_checkout(name, phone, address, shipping_method, payment_method):
+    """Proses checkout (shipping_method/payment_method = key SHIPPING_METHODS/PAYMENT_METHODS)"""
+    cart = get_cart()
+    quote = quote_cart(cart, shipping_method, payment_method)
+    if quote.missing:
+        st.error("Beberapa produk di keranjang sudah tidak tersedia, hapus dari keranjang terlebih dahulu")
+        return
+    if any(cart.prices.setdefault(product_id, product["price"]) != product["price"]
+           for product_id, product, _, _ in quote.lines):
+        st.error("Harga produk berubah, periksa keranjang sebelum melanjutkan")
+        st.session_state.checkout_active = False
+        return
 
-def process_checkout(name, phone, address, shipping_method, payment_method, grand_total, shipping_cost):
-    """Proses checkout"""
     try:
-        transactions = load_from_json(TRANSACTIONS_FILE)
-        
+        transaction_id = new_transaction_id()
         transaction = {
-            "id": datetime.now().strftime("%Y%m%d%H%M%S"),
-            "date": datetime.now().strftime("%d/%m/%Y %H:%M"),
+            "id": transaction_id,
+            "date": TransactionIdAllocator.moment(transaction_id).strftime("%d/%m/%Y %H:%M"),
             "username": st.session_state.username,
             "customer": {"name": name, "phone": phone, "address": address},
             "items": [{
-                "id": item["product"]["id"],
-                "name": item["product"]["name"],
-                "price": item["product"]["price"],
-                "quantity": item["quantity"]
-            } for item in st.session_state.cart],
-            "total": grand_total,
-            "payment": {"method": payment_method, "status": "pending"},
+                "id": product["id"],
+                "name": product["name"],
+                "price": product["price"],
+                "quantity": quantity
+            } for _, product, quantity, _ in quote.lines],
+            "total": quote.total,
+            "payment": {"method": quote.payment["label"], "status": "pending"},
             "shipping": {
-                "method": shipping_method.split()[0],
-                "cost": shipping_cost,
-                "estimate": "2-3 hari" if "JNE" in shipping_method else "1-2 hari" if "J&T" in shipping_method else "3-5 hari"
+                "method": quote.shipping["name"],
+                "cost": quote.shipping_cost,
+                "estimate": quote.shipping["estimate"]
             },
             "status": "pending"
         }
         
-        transactions.append(transaction)
-        save_to_json(TRANSACTIONS_FILE, transactions)
-        
-        # Update stok produk
-        products = load_from_json(PRODUCTS_FILE)
-        for item in st.session_state.cart:
-            for product in products:
-                if product["id"] == item["product"]["id"]:
-                    product["stock"] -= item["quantity"]
-                    break
-        save_to_json(PRODUCTS_FILE, products)
-        
-        st.session_state.cart = []
+        # Reservasi stok dulu agar pesanan tidak melebihi stok yang ada
+        quantities = dict(cart.items)
+        storage = get_storage()
+        stock_after = storage.reserve_stock(quantities)
+        try:
+            version = storage.add_transaction(transaction)
+        except Exception:
+            storage.release_stock(quantities)
+            raise
+
+        # Agregat diperbarui langsung (murah, harus berurutan sesuai versi);
+        # pesan admin dan peringatan stok dikerjakan satu job di background
+        record_transaction(transaction, version)
+        low_stock_ids = [
+            product_id for product_id, product, quantity, _ in quote.lines
+            if crossed_low_stock({**product, "stock": stock_after[product_id] + quantity},
+                                 {**product, "stock": stock_after[product_id]})
+        ]
+        enqueue_job("process_order", transaction=transaction, low_stock_ids=low_stock_ids)
+
+        cart.items.clear()
+        cart.save()
+        st.session_state.last_order = {"id": transaction["id"], "total": transaction["total"]}
         st.session_state.checkout_active = False
         st.session_state.checkout_success = True
         st.rerun()
-        
+
+    except InsufficientStockError as e:
+        names = {product_id: product["name"] for product_id, product, _, _ in quote.lines}
+        for product_id, available in e.shortages.items():
+            st.error(f"Stok {names.get(product_id, product_id)} tidak cukup (tersisa {available} kg)")
     except Exception as e:
         st.error(f"Gagal memproses checkout: {str(e)}")
 
+@profiled_page
 def show_checkout_success():
     """Tampilkan pesan sukses checkout"""
     st.balloons()
@@ -389,9 +3835,13 @@ def show_checkout_success():
     Silakan lakukan pembayaran dan konfirmasi via WhatsApp:
     """)
     
-    whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text=Halo%20Admin,%20saya%20telah%20melakukan%20pembayaran"
-    if st.button("💬 Hubungi via WhatsApp", type="primary"):
-        webbrowser.open(whatsapp_url)
+    message = "Halo Admin, saya telah melakukan pembayaran"
+    order = st.session_state.get("last_order")
+    if order:
+        message += f" untuk pesanan #{order['id']} sebesar Rp{order['total']:,}"
+    whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text={urllib.parse.quote(message)}"
+    # Dibuka di browser user, bukan di server
+    st.link_button("💬 Hubungi via WhatsApp", whatsapp_url, type="primary")
     
     if st.button("🏠 Kembali ke Beranda"):
         st.session_state.checkout_success = False
@@ -399,35 +3849,46 @@ def show_checkout_success():
         st.rerun()
 
 # ====================== FUNGSI ADMIN ======================
+@profiled_page
 def show_admin_panel():
     """Panel admin"""
     st.header("👨‍💻 Admin Dashboard")
     
-    tab1, tab2, tab3 = st.tabs(["Laporan", "Kelola Produk", "Kelola User"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(
+        ["Laporan", "Analitik", "Stok Menipis", "Kelola Produk", "Kelola User", "Ekspor", "Performa"]
+    )
     
     with tab1:
         show_admin_report()
     with tab2:
-        manage_products()
+        show_analytics()
     with tab3:
+        show_low_stock()
+    with tab4:
+        manage_products()
+    with tab5:
         manage_users()
+    with tab6:
+        show_export()
+    with tab7:
+        show_performance()
 
 def show_admin_report():
     """Laporan penjualan"""
-    transactions = load_from_json(TRANSACTIONS_FILE)
-    
-    completed_trans = [t for t in transactions if t.get("status") == "completed"]
-    total_sales = sum(t["total"] for t in completed_trans)
-    total_transactions = len(completed_trans)
-    
+    aggregates = get_sales_aggregates()
+    total_sales = aggregates["status_totals"].get("completed", 0)
+    total_transactions = aggregates["status_counts"].get("completed", 0)
+
     col1, col2 = st.columns(2)
     with col1:
         st.metric("Total Penjualan", f"Rp{total_sales:,}")
     with col2:
         st.metric("Total Transaksi", total_transactions)
     
+    show_bulk_complete()
+
     st.subheader("Transaksi Terakhir")
-    for trans in transactions[-5:]:
+    for trans in get_storage().recent_transactions(5):
         with st.expander(f"📦 Pesanan #{trans['id']} - {trans['date']}"):
             cols = st.columns([3, 1])
             with cols[0]:
@@ -453,22 +3914,242 @@ def show_admin_report():
                 whatsapp_url = f"https://wa.me/{WHATSAPP_NUMBER}?text=Halo%20Admin,%20saya%20ingin%20konfirmasi%20pesanan%20#{trans['id']}"
                 st.link_button("💬 Hubungi Customer", whatsapp_url)
 
+def show_analytics():
+    """Grafik pendapatan dan penjualan per hari/minggu serta produk terlaris"""
+    st.subheader("📈 Analitik Penjualan")
+
+    analytics = get_sales_analytics()
+    if not analytics["orders"]:
+        st.info("Belum ada transaksi selesai")
+        return
+
+    cols = st.columns(3)
+    with cols[0]:
+        st.metric("Pendapatan", f"Rp{analytics['revenue']:,}")
+    with cols[1]:
+        st.metric("Pesanan Selesai", analytics["orders"])
+    with cols[2]:
+        st.metric("Rata-rata Nilai Pesanan", f"Rp{analytics['average_order']:,.0f}")
+
+    period = st.radio("Periode", ["Harian", "Mingguan"], horizontal=True, key="analytics_period")
+    series = analytics["daily"] if period == "Harian" else analytics["weekly"]
+
+    st.write("**Pendapatan (Rp)**")
+    st.bar_chart(series["pendapatan"])
+    st.write("**Jumlah Terjual (kg)**")
+    st.line_chart(series["jumlah_kg"])
+
+    st.write("**Produk Terlaris**")
+    top = analytics["top_products"]
+    st.bar_chart(top.set_index("nama")["pendapatan"], horizontal=True)
+    st.dataframe(top, hide_index=True)
+
+def show_low_stock():
+    """Daftar produk yang stoknya di bawah batas (hanya produk yang perlu perhatian)"""
+    st.subheader("⚠️ Stok Menipis")
+
+    low_stock = get_catalog_index().low_stock
+    if not low_stock:
+        st.success("Semua stok aman")
+        return
+
+    st.caption(f"{len(low_stock)} produk di bawah batas stok")
+    for product in low_stock:
+        cols = st.columns([3, 1, 1])
+        with cols[0]:
+            st.write(f"**{product['name']}** (ID: {product['id']})")
+        with cols[1]:
+            if product["stock"] == 0:
+                st.error("Habis")
+            else:
+                st.warning(f"{product['stock']} kg")
+        with cols[2]:
+            st.caption(f"Batas: {stock_threshold(product)} kg")
+
+def show_export():
+    """Ekspor transaksi ke CSV/XLSX untuk pembukuan"""
+    st.subheader("Ekspor Transaksi")
+
+    today = datetime.now().date()
+    date_range = st.date_input(
+        "Rentang Tanggal",
+        value=(today.replace(day=1), today),
+        format="DD/MM/YYYY",
+        key="export_dates"
+    )
+    if len(date_range) != 2:
+        st.info("Pilih tanggal awal dan akhir")
+        return
+    start_date, end_date = date_range
+
+    statuses = st.multiselect(
+        "Status",
+        ["pending", "completed"],
+        default=["pending", "completed"],
+        key="export_statuses"
+    )
+    if not statuses:
+        st.info("Pilih minimal satu status")
+        return
+
+    formats = ["CSV", "XLSX"] if HAS_OPENPYXL else ["CSV"]
+    file_format = st.radio("Format", formats, horizontal=True, key="export_format")
+    if not HAS_OPENPYXL:
+        st.caption("Install openpyxl untuk ekspor XLSX")
+
+    # File dibuat saat tombol diklik (di luar rerun), baris dibaca per potongan
+    def build_file():
+        rows = iter_export_rows(start_date, end_date, set(statuses))
+        return export_xlsx(rows) if file_format == "XLSX" else export_csv(rows)
+
+    st.download_button(
+        "⬇️ Unduh Transaksi",
+        data=build_file,
+        file_name=f"transaksi_{start_date:%Y%m%d}_{end_date:%Y%m%d}.{file_format.lower()}",
+        mime=(
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            if file_format == "XLSX" else "text/csv"
+        ),
+        on_click="ignore",
+        key="export_download"
+    )
+
+def show_performance():
+    """Profil rerun terakhir: waktu per halaman/fungsi, I/O dan parse JSON"""
+    st.subheader("Performa")
+
+    stats = get_startup_stats()
+    history = list(PROFILER.history)
+    if not PROFILER.enabled:
+        st.info("Profiling nonaktif, jalankan dengan BAKUL_PROFILING=1 untuk mengaktifkan")
+
+    count = len(history) or 1
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Inisialisasi Proses", f"{stats['init_ms'] or 0:.0f} ms")
+    with col2:
+        st.metric("Rata-rata Rerun", f"{sum(r['total_ms'] for r in history) / count:.0f} ms")
+    with col3:
+        st.metric(
+            "Rata-rata I/O",
+            f"{sum(r['bytes_read'] + r['bytes_written'] for r in history) / count / 1024:.0f} KB"
+        )
+    with col4:
+        st.metric("Rata-rata Parse JSON", f"{sum(r['json_parse_ms'] for r in history) / count:.1f} ms")
+
+    # Cache DataStore dibagikan semua sesi di proses ini, dihitung sejak proses mulai
+    cache = get_data_store().stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Cache Hit Rate", f"{cache['hit_rate']:.0%}")
+    with col2:
+        st.metric("Cache Hit / Miss", f"{cache['hits']:,} / {cache['misses']:,}")
+    with col3:
+        st.metric("File di Cache", cache["entries"])
+
+    if not history:
+        st.caption("Belum ada rerun yang tercatat")
+    else:
+        st.caption(f"{len(history)} rerun terakhir di proses ini")
+        st.dataframe(
+            [
+                {
+                    "Waktu": record["timestamp"][11:19],
+                    "Halaman": record["page"] or "-",
+                    "Total (ms)": record["total_ms"],
+                    "Di luar fungsi (ms)": record["other_ms"],
+                    "Baca (KB)": record["bytes_read"] / 1024,
+                    "Tulis (KB)": record["bytes_written"] / 1024,
+                    "Parse JSON (ms)": record["json_parse_ms"]
+                }
+                for record in reversed(history)
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+
+        # Self = waktu di fungsi itu sendiri, di luar fungsi lain yang diukur
+        totals = {}
+        for record in history:
+            for name, section in record["sections"].items():
+                entry = totals.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += section["calls"]
+                entry[1] += section["ms"]
+                entry[2] += section["self_ms"]
+        st.subheader("Per Fungsi")
+        st.dataframe(
+            [
+                {
+                    "Fungsi": name,
+                    "Panggilan": calls,
+                    "Total (ms)": ms,
+                    "Self (ms)": self_ms,
+                    "Self per rerun (ms)": self_ms / len(history)
+                }
+                for name, (calls, ms, self_ms) in sorted(totals.items(), key=lambda item: -item[1][2])
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.download_button(
+        "⬇️ Unduh Log Profil (JSONL)",
+        data=PROFILER.read_log,
+        file_name="profile.jsonl",
+        mime="application/x-ndjson",
+        on_click="ignore",
+        key="profile_download"
+    )
+
+def show_bulk_complete():
+    """Selesaikan banyak pesanan pending sekaligus"""
+    st.subheader("Pesanan Pending")
+
+    pending = get_storage().transactions_by_status("pending")
+    if not pending:
+        st.caption("Tidak ada pesanan pending")
+        return
+
+    labels = {t["id"]: f"#{t['id']} - {t['customer']['name']} - Rp{t['total']:,}" for t in pending}
+    selected = st.multiselect(
+        f"Pilih pesanan ({len(labels)} pending)",
+        list(labels),
+        format_func=labels.get,
+        key="bulk_complete_ids"
+    )
+
+    if st.button("✅ Selesaikan Terpilih", disabled=not selected):
+        results = update_transaction_statuses(selected, "completed")
+        failed = [trans_id for trans_id, ok in results.items() if not ok]
+        for trans_id in failed:
+            st.error(f"Transaksi #{trans_id} tidak ditemukan")
+        if not failed:
+            st.success(f"{len(results)} transaksi diselesaikan!")
+            st.rerun()
+
+def update_transaction_statuses(trans_ids, new_status):
+    """Update status beberapa transaksi dalam satu penulisan
+
+    Mengembalikan {id: True jika berhasil, False jika tidak ditemukan}.
+    """
+    previous, version = get_storage().update_transaction_statuses(
+        {trans_id: new_status for trans_id in trans_ids}
+    )
+    record_status_changes([trans for trans in previous.values() if trans is not None], new_status, version)
+    return {trans_id: trans is not None for trans_id, trans in previous.items()}
+
 def update_transaction_status(trans_id, new_status):
     """Update status transaksi"""
-    transactions = load_from_json(TRANSACTIONS_FILE)
-    
-    for t in transactions:
-        if t["id"] == trans_id:
-            t["status"] = new_status
-            save_to_json(TRANSACTIONS_FILE, transactions)
-            st.success(f"Status transaksi #{trans_id} diubah menjadi {new_status}!")
-            st.rerun()
+    if update_transaction_statuses([trans_id], new_status)[trans_id]:
+        st.success(f"Status transaksi #{trans_id} diubah menjadi {new_status}!")
+        st.rerun()
     
     st.error(f"Transaksi #{trans_id} tidak ditemukan")
 
 def manage_products():
     """Kelola produk"""
-    products = load_from_json(PRODUCTS_FILE)
+    storage = get_storage()
+    products = storage.load_products()
     
     st.subheader("➕ Tambah Produk Baru")
     with st.form("add_product_form"):
@@ -479,6 +4160,7 @@ def manage_products():
             stock = st.number_input("Stok*", min_value=0)
         with cols[1]:
             category = st.selectbox("Kategori*", ["bawang", "bibit"])
+            threshold = st.number_input("Batas Stok Menipis", min_value=0, value=LOW_STOCK_THRESHOLD)
         
         description = st.text_area("Deskripsi Produk")
         uploaded_file = st.file_uploader("Gambar Produk (jpg/png)", type=["jpg", "png", "jpeg"])
@@ -489,9 +4171,7 @@ def manage_products():
             else:
                 image_path = LOGO_PATH
                 if uploaded_file is not None:
-                    image_path = os.path.join(PRODUCT_IMAGE_DIR, uploaded_file.name)
-                    with open(image_path, "wb") as img_file:
-                        img_file.write(uploaded_file.getbuffer())
+                    image_path = store_uploaded_image(uploaded_file)
                 
                 new_product = {
                     "id": max(p["id"] for p in products) + 1 if products else 1,
@@ -500,11 +4180,12 @@ def manage_products():
                     "stock": stock,
                     "description": description,
                     "category": category,
-                    "image": image_path
+                    "image": image_path,
+                    "low_stock_threshold": threshold
                 }
                 
-                products.append(new_product)
-                save_to_json(PRODUCTS_FILE, products)
+                storage.add_product(new_product)
+                enqueue_job("process_product_image", product_id=new_product["id"], image_path=image_path)
                 st.success("Produk berhasil ditambahkan!")
                 st.rerun()
     
@@ -519,7 +4200,7 @@ def manage_products():
             with cols[1]:
                 try:
                     st.image(
-                        product.get("image", LOGO_PATH),
+                        product_thumbnail(product),
                         width=200,
                         use_container_width=True
                     )
@@ -533,6 +4214,12 @@ def manage_products():
                     min_value=0,
                     key=f"stock_{product['id']}"
                 )
+                new_threshold = st.number_input(
+                    "Batas Stok Menipis",
+                    value=stock_threshold(product),
+                    min_value=0,
+                    key=f"threshold_{product['id']}"
+                )
                 
                 new_image = st.file_uploader(
                     "Ganti Gambar",
@@ -541,33 +4228,31 @@ def manage_products():
                 )
                 
                 if st.form_submit_button("🔄 Update Produk"):
-                    product["stock"] = new_stock
+                    changes = {"stock": new_stock, "low_stock_threshold": new_threshold}
                     
                     if new_image is not None:
-                        if product["image"] != LOGO_PATH and os.path.exists(product["image"]):
-                            os.remove(product["image"])
-                        
-                        image_path = os.path.join(PRODUCT_IMAGE_DIR, new_image.name)
-                        with open(image_path, "wb") as img_file:
-                            img_file.write(new_image.getbuffer())
-                        product["image"] = image_path
-                    
-                    save_to_json(PRODUCTS_FILE, products)
+                        changes["image"] = store_uploaded_image(new_image)
+                        changes["thumbnail"] = None  # dibuat ulang oleh job di bawah
+
+                    storage.update_product(product["id"], changes)
+                    if new_image is not None:
+                        get_blob_store().release(product["image"])
+                        enqueue_job("process_product_image", product_id=product["id"], image_path=changes["image"])
+                    if crossed_low_stock(product, {**product, **changes}):
+                        enqueue_job("evaluate_stock_alerts", product_ids=[product["id"]])
                     st.success("Produk diperbarui!")
                     st.rerun()
             
             if st.button(f"🗑️ Hapus Produk", key=f"del_{product['id']}"):
-                if product["image"] != LOGO_PATH and os.path.exists(product["image"]):
-                    os.remove(product["image"])
-                
-                products.remove(product)
-                save_to_json(PRODUCTS_FILE, products)
+                storage.delete_product(product["id"])
+                get_blob_store().release(product["image"])
                 st.success("Produk dihapus!")
                 st.rerun()
 
 def manage_users():
     """Kelola user"""
-    users = load_from_json(USERS_FILE)
+    storage = get_storage()
+    users = storage.load_users()
     
     st.subheader("👥 Daftar Pengguna")
     for user in users:
@@ -576,8 +4261,7 @@ def manage_users():
             st.write(f"**Username:** {user['username']}")
         with cols[1]:
             if st.button(f"Hapus", key=f"del_{user['username']}"):
-                users.remove(user)
-                save_to_json(USERS_FILE, users)
+                storage.delete_user(user["username"])
                 st.success("Pengguna dihapus!")
                 st.rerun()
     
@@ -591,26 +4275,35 @@ def manage_users():
         if st.form_submit_button("Tambah Pengguna"):
             if not username or not password:
                 st.error("Username dan password harus diisi")
-            elif any(u["username"] == username for u in users):
+            elif storage.get_user(username):
                 st.error("Username sudah digunakan")
             else:
-                users.append({"username": username, "password": password})
-                save_to_json(USERS_FILE, users)
+                storage.add_user({"username": username, "password": hash_password(password)})
                 st.success("Pengguna berhasil ditambahkan!")
                 st.rerun()
 
+@profiled_page
 def show_history():
     """Tampilkan riwayat transaksi"""
     st.header("📜 Riwayat Transaksi")
     
-    transactions = load_from_json(TRANSACTIONS_FILE)
-    user_transactions = [t for t in transactions if t["username"] == st.session_state.username]
-    
-    if not user_transactions:
+    page = st.session_state.get("history_page", 1)
+    user_transactions, total = get_storage().user_transactions(
+        st.session_state.username,
+        offset=(page - 1) * HISTORY_PAGE_SIZE,
+        limit=HISTORY_PAGE_SIZE
+    )
+
+    if not total:
         st.warning("Belum ada riwayat transaksi")
         return
-    
-    for trans in reversed(user_transactions):
+
+    page_count = (total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    if page > page_count:
+        st.session_state.history_page = page_count
+        st.rerun()
+
+    for trans in user_transactions:
         with st.expander(f"📦 Pesanan #{trans['id']} - {trans['date']}"):
             st.write(f"**Status:** {trans.get('status', 'pending').title()}")
             st.write(f"**Total:** Rp{trans['total']:,}")
@@ -623,10 +4316,12 @@ def show_history():
             st.write("**Alamat Pengiriman:**")
             st.write(trans["customer"]["address"])
 
+    show_pagination("history_page", page, page_count)
+
 # ====================== FUNGSI UTAMA ======================
 def main():
     """Aplikasi utama"""
-    setup_files()
+    initialize_app()
     
     # Inisialisasi session state
     if 'logged_in' not in st.session_state:
@@ -639,8 +4334,6 @@ def main():
         st.session_state.checkout_active = False
     if 'checkout_success' not in st.session_state:
         st.session_state.checkout_success = False
-    if 'cart' not in st.session_state:
-        st.session_state.cart = []
     
     # Tampilan login jika belum login
     if not st.session_state.logged_in:
@@ -694,4 +4387,9 @@ def main():
         show_admin_panel()
 
 if __name__ == "__main__":
-    main()
+    PROFILER.begin()
+    try:
+        main()
+    finally:
+        # finally juga menangkap st.rerun()/st.stop() yang keluar lewat exception
+        record_rerun(time.perf_counter() - RERUN_STARTED)
@@ -0,0 +1,275 @@
+"""Benchmark alur utama Bakul Bawang pada data sintetis
+
+Contoh:
+    python benchmark.py --scales 10,1000,100000 --output hasil.json
+    python benchmark.py --backend sqlite --compare hasil.json
+
+Setiap skala dijalankan di folder sementara berisi products.json,
+transactions.json (format lama, dimigrasi oleh setup_files) dan users.json
+sintetis. Fungsi app.py dipanggil langsung (mode bare Streamlit), sehingga
+yang diukur adalah jalur data + pembuatan elemen, tanpa browser.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ====================== DATA SINTETIS ======================
+def make_products(count):
+    """Produk sintetis dengan stok besar agar checkout tidak pernah kehabisan"""
+    return [
+        {
+            "id": i,
+            "name": f"{'Bawang Merah' if i % 2 else 'Bibit Bawang'} #{i}",
+            "price": 10000 + (i * 137) % 40000,
+            "stock": 10 ** 9,
+            "description": "Produk sintetis untuk benchmark",
+            "category": "bawang" if i % 2 else "bibit",
+            "image": "assets/logo.png"
+        }
+        for i in range(1, count + 1)
+    ]
+
+def make_users(count):
+    return [{"username": f"user{i}", "password": f"pass{i}"} for i in range(count)]
+
+def make_transaction(app, i, products, users, rng, start):
+    """Satu transaksi sintetis dengan format yang sama seperti process_checkout
+
+    Metode kirim/bayar diambil dari app agar label dan biaya selalu sama
+    dengan yang ditulis aplikasi.
+    """
+    when = start + timedelta(minutes=i)
+    items = [
+        {"id": p["id"], "name": p["name"], "price": p["price"], "quantity": rng.randint(1, 20)}
+        for p in rng.sample(products, k=min(len(products), rng.randint(1, 3)))
+    ]
+    shipping = app.SHIPPING_METHODS[rng.choice(list(app.SHIPPING_METHODS))]
+    payment = app.PAYMENT_METHODS[rng.choice(list(app.PAYMENT_METHODS))]
+    return {
+        "id": f"T{i:08d}",
+        "date": when.strftime("%d/%m/%Y %H:%M"),
+        "username": rng.choice(users)["username"],
+        "customer": {"name": f"Customer {i}", "phone": "08123456789", "address": "Brebes, Jawa Tengah"},
+        "items": items,
+        "total": sum(item["price"] * item["quantity"] for item in items) + shipping["cost"] + payment["fee"],
+        "payment": {"method": payment["label"], "status": "pending"},
+        "shipping": {"method": shipping["name"], "cost": shipping["cost"], "estimate": shipping["estimate"]},
+        "status": "completed" if rng.random() < 0.7 else "pending"
+    }
+
+def generate_dataset(app, directory, transactions, seed=42):
+    """Tulis data/*.json sintetis; transaksi ditulis bertahap agar hemat memori"""
+    rng = random.Random(seed)
+    products = make_products(max(2, min(2000, transactions // 50)))
+    users = make_users(max(1, min(50000, transactions // 20)))
+    start = datetime(2024, 1, 1)
+
+    data_dir = os.path.join(directory, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "products.json"), 'w', encoding='utf-8') as f:
+        json.dump(products, f, indent=4)
+    with open(os.path.join(data_dir, "users.json"), 'w', encoding='utf-8') as f:
+        json.dump(users, f, indent=4)
+    with open(os.path.join(data_dir, "transactions.json"), 'w', encoding='utf-8') as f:
+        f.write("[\n")
+        for i in range(transactions):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(make_transaction(app, i, products, users, rng, start), ensure_ascii=False))
+        f.write("\n]")
+    return products, users
+
+# ====================== PENGUKURAN ======================
+def percentile(sorted_values, pct):
+    """Persentil nearest-rank dari list yang sudah terurut"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def measure(func, iterations, max_seconds, setup=None, track_memory=True):
+    """Jalankan func berulang, kembalikan ringkasan latensi (ms) dan puncak memori
+
+    Latensi diukur tanpa tracemalloc; puncak memori diukur terpisah pada satu
+    pemanggilan tambahan karena tracemalloc memperlambat eksekusi. Operasi
+    yang tidak bisa diulang (mis. migrasi) memakai track_memory=False.
+    """
+    durations = []
+    deadline = time.perf_counter() + max_seconds
+    while len(durations) < iterations and (not durations or time.perf_counter() < deadline):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - started) * 1000)
+
+    peak = None
+    if track_memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    durations.sort()
+    return {
+        "n": len(durations),
+        "mean_ms": sum(durations) / len(durations),
+        "p50_ms": percentile(durations, 50),
+        "p90_ms": percentile(durations, 90),
+        "p99_ms": percentile(durations, 99),
+        "max_ms": durations[-1],
+        "peak_mem_kb": peak / 1024 if peak is not None else None
+    }
+
+def max_rss_kb():
+    """RSS maksimum proses (hanya Unix)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 if sys.platform == "darwin" else usage
+
+# ====================== SKENARIO ======================
+def run_scale(app, st, scale, iterations, max_seconds, seed):
+    """Ukur semua operasi untuk satu ukuran data"""
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix=f"bakul_bench_{scale}_")
+    cwd = os.getcwd()
+    try:
+        products, users = generate_dataset(app, workdir, scale, seed)
+        os.chdir(workdir)
+        st.cache_resource.clear()
+        st.cache_data.clear()
+
+        results = {}
+        results["setup_files (migrasi)"] = measure(app.setup_files, 1, max_seconds, track_memory=False)
+
+        store = app.get_data_store()
+        results["load_from_json (cold)"] = measure(
+            lambda: app.load_from_json(app.USERS_FILE), iterations, max_seconds,
+            setup=lambda: store.invalidate(app.USERS_FILE)
+        )
+        results["load_from_json (warm)"] = measure(
+            lambda: app.load_from_json(app.USERS_FILE), iterations, max_seconds
+        )
+        users_data = app.load_from_json(app.USERS_FILE, mutable=True)
+        results["save_to_json"] = measure(
+            lambda: app.save_to_json(app.USERS_FILE, users_data), iterations, max_seconds
+        )
+        results["load_transactions (cold)"] = measure(
+            lambda: app.TransactionLog(app.TRANSACTIONS_JOURNAL, app.TRANSACTIONS_DIR).transactions(),
+            iterations, max_seconds
+        )
+
+        storage = app.get_storage()
+        storage.load_transactions()  # pemanasan cache/index
+
+        def checkout():
+            st.session_state.username = rng.choice(users)["username"]
+            st.session_state.cart = app.Cart(st.session_state.username, {
+                product["id"]: rng.randint(1, 5)
+                for product in rng.sample(storage.load_products(), k=min(2, len(products)))
+            })
+            app.process_checkout(
+                "Benchmark", "08123456789", "Brebes",
+                rng.choice(list(app.SHIPPING_METHODS)), rng.choice(list(app.PAYMENT_METHODS))
+            )
+        results["process_checkout"] = measure(checkout, iterations, max_seconds)
+
+        def update_status():
+            trans_id = f"T{rng.randrange(scale):08d}" if scale else "T00000000"
+            app.update_transaction_status(trans_id, rng.choice(["completed", "pending"]))
+        results["update_transaction_status"] = measure(update_status, iterations, max_seconds)
+
+        def history():
+            st.session_state.username = rng.choice(users)["username"]
+            app.show_history()
+        results["show_history"] = measure(history, iterations, max_seconds)
+        results["show_admin_report"] = measure(app.show_admin_report, iterations, max_seconds)
+        results["rebuild_aggregates"] = measure(app.rebuild_aggregates, iterations, max_seconds)
+        return results
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def print_results(results, baseline=None):
+    """Tampilkan tabel hasil; kolom rasio p50 jika ada baseline"""
+    for scale, ops in results.items():
+        print(f"\n== {scale} transaksi ==")
+        print(f"{'operasi':<28}{'n':>6}{'p50 ms':>11}{'p90 ms':>11}{'p99 ms':>11}{'peak KB':>12}"
+              + (f"{'vs base':>10}" if baseline else ""))
+        for name, stats in ops.items():
+            peak = f"{stats['peak_mem_kb']:.1f}" if stats["peak_mem_kb"] is not None else "-"
+            line = (f"{name:<28}{stats['n']:>6}{stats['p50_ms']:>11.3f}{stats['p90_ms']:>11.3f}"
+                    f"{stats['p99_ms']:>11.3f}{peak:>12}")
+            base = (baseline or {}).get(scale, {}).get(name)
+            if base and base["p50_ms"]:
+                line += f"{stats['p50_ms'] / base['p50_ms']:>9.2f}x"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark alur toko Bakul Bawang")
+    parser.add_argument("--scales", default="10,1000,10000,100000",
+                        help="jumlah transaksi sintetis, dipisah koma (mis. 10,1000,1000000)")
+    parser.add_argument("--iterations", type=int, default=50, help="iterasi maksimum per operasi")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="batas waktu per operasi")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json", help="file hasil JSON")
+    parser.add_argument("--compare", help="file hasil sebelumnya untuk perbandingan p50")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+
+    # Backend dipilih lewat env sebelum app diimpor
+    os.environ["BAKUL_STORAGE_BACKEND"] = args.backend
+    sys.path.insert(0, APP_DIR)
+    import streamlit as st
+    started = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - started) * 1000
+    logging.disable(logging.WARNING)  # peringatan mode bare Streamlit tidak relevan di sini
+
+    results = {}
+    for scale in (int(s) for s in args.scales.split(",")):
+        print(f"Menjalankan skala {scale}...", file=sys.stderr)
+        results[str(scale)] = run_scale(app, st, scale, args.iterations, args.max_seconds, args.seed)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "iterations": args.iterations,
+            "import_app_ms": import_ms,
+            "max_rss_kb": max_rss_kb()
+        },
+        "results": results
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+
+    print_results(results, baseline)
+    print(f"\nHasil disimpan ke {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Layanan data lokal untuk menjalankan beberapa worker Streamlit sekaligus
+
+Contoh:
+    python data_service.py --address unix:data/bakul.sock --backend sqlite
+
+lalu jalankan worker (masing-masing di port sendiri, di belakang load balancer):
+    BAKUL_STORAGE_BACKEND=service BAKUL_DATA_SERVICE=unix:data/bakul.sock \\
+        streamlit run app.py --server.port 8501
+
+Layanan ini satu-satunya proses yang membaca dan menulis produk, transaksi
+dan user; worker terhubung lewat pool koneksi (lihat ServiceStorage di app.py).
+"""
+import argparse
+import logging
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def main():
+    parser = argparse.ArgumentParser(description="Layanan data bersama Bakul Bawang")
+    parser.add_argument("--address", default=os.environ.get("BAKUL_DATA_SERVICE", "unix:data/bakul.sock"),
+                        help="unix:/path/socket atau host:port (localhost)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    # Layanan sendiri memakai backend lokal, bukan backend "service"
+    os.environ["BAKUL_STORAGE_BACKEND"] = args.backend
+    sys.path.insert(0, APP_DIR)
+    import app
+    logging.disable(logging.WARNING)  # peringatan mode bare Streamlit tidak relevan di sini
+
+    print(f"Layanan data ({args.backend}) berjalan di {args.address}", file=sys.stderr)
+    try:
+        app.serve_data_service(args.address, args.backend)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()